@@ -0,0 +1,41 @@
+from __future__ import annotations
+import argparse, sys, threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Robot_Control"))
+
+from animation import load_animation, play
+from arbiter import CLAW_RELEASE, get_arbiter
+
+HOME = (90, 10, 170, *CLAW_RELEASE)   # same start pose "hello" uses
+
+
+def main():
+    ap = argparse.ArgumentParser("Play the wave animation on the arm")
+    ap.add_argument("--animation", default=Path(__file__).with_name("wave.json"), type=Path)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--dry-run", action="store_true", help="print frames instead of driving the arm")
+    args = ap.parse_args()
+
+    anim = load_animation(args.animation)
+    if args.dry_run:
+        emit = lambda pose: print(pose)
+    else:
+        arbiter = get_arbiter()
+        emit = lambda pose: arbiter.submit_frame("animation", pose)
+        emit(HOME)
+
+    for _ in range(args.repeat):
+        done = threading.Event()
+        pb = play(anim, emit, lambda: HOME, lambda cancelled: done.set())
+        try:
+            done.wait()
+        except KeyboardInterrupt:
+            pb.cancel()
+            emit(HOME)
+            break
+        print(f"[Wave] {pb.frames_sent} frames, {pb.frames_skipped} skipped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
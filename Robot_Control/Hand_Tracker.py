@@ -1,196 +1,170 @@
+import argparse
+import sys
+import time
 import cv2
 import mediapipe as mp
 import numpy as np
-import serial
-import serial.tools.list_ports
-import struct
+from hand_pipeline import HandPipeline
+from hand_roi import AdaptiveScaler, RoiTracker
+from hand_features import extract_features, landmarks_to_array
+from hand_smoothing import ClawHysteresis, OneEuroFilter
+from arbiter import get_arbiter
+from robot_state import get_state
+from recorder import record_array
 
 mp_drawing = mp.solutions.drawing_utils
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(min_detection_confidence=0.7, min_tracking_confidence=0.7)
-servo1_pos, servo2_pos, servo3_pos = 90, 90, 90
-ser = None
-
-claw_grabbing = True
-claw_grab_pos = (170, 10)
-claw_release_pos = (10, 170)
+# Tracking mode follows the hand from one full frame to the next; crops that
+# move with the hand would fight it, so cropped inference detects afresh.
+roi_hands = None
+state = get_state()
+
+# Crop inference to the last hand box
+HAND_ROI = True
+# Shrink input when behind target
+HAND_ADAPTIVE_SCALE = True
+HAND_TARGET_FPS = 20
+
+# One-Euro smoothing on the landmarks before mapping (see hand_smoothing.py)
+HAND_SMOOTHING = True
+
+pipeline = None
+landmark_log = None  # list of (t_capture, (21, 3) array) while recording
+baseline_angle = None
+previous_claw_state = None
+smoother = OneEuroFilter()
+claw_gate = ClawHysteresis()
 
 def is_fist(landmarks):
-    def curled(tip, pip):
-        return tip.y > pip.y
-
-    index_tip  = landmarks[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    index_pip  = landmarks[mp_hands.HandLandmark.INDEX_FINGER_PIP]
-    middle_tip = landmarks[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-    middle_pip = landmarks[mp_hands.HandLandmark.MIDDLE_FINGER_PIP]
-    ring_tip   = landmarks[mp_hands.HandLandmark.RING_FINGER_TIP]
-    ring_pip   = landmarks[mp_hands.HandLandmark.RING_FINGER_PIP]
-    pinky_tip  = landmarks[mp_hands.HandLandmark.PINKY_TIP]
-    pinky_pip  = landmarks[mp_hands.HandLandmark.PINKY_PIP]
-
-    curled_count = 0
-    for tip, pip in [
-        (index_tip, index_pip),
-        (middle_tip, middle_pip),
-        (ring_tip, ring_pip),
-        (pinky_tip, pinky_pip),
-    ]:
-        if curled(tip, pip):
-            curled_count += 1
-    return curled_count >= 3
+    return bool(extract_features(landmarks_to_array(landmarks)).fist)
 
 def is_hand_open(landmarks):
-    wrist = landmarks[mp_hands.HandLandmark.WRIST]
-    index_tip = landmarks[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    middle_tip = landmarks[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-    ring_tip = landmarks[mp_hands.HandLandmark.RING_FINGER_TIP]
-    pinky_tip = landmarks[mp_hands.HandLandmark.PINKY_TIP]
-
-    def distance(point1, point2):
-        return np.sqrt((point1.x - point2.x)**2 + (point1.y - point2.y)**2)
-
-    distances = [
-        distance(wrist, index_tip),
-        distance(wrist, middle_tip),
-        distance(wrist, ring_tip),
-        distance(wrist, pinky_tip)
-    ]
-
-    average_distance = np.mean(distances)
-
-    if average_distance > 0.3:
-        return True
-    else:
-        return False
-
-def find_arduino_port():
-    ports = list(serial.tools.list_ports.comports())
-    for port in ports:
-        if 'Arduino' in port.description or 'usbmodem' in port.device:
-            return port.device
-    return None
-
-def initialize_serial_connection():
-    global ser
-    port = find_arduino_port()
-    if port:
-        try:
-            ser = serial.Serial(port, 9600)
-        except Exception as e:
-            ser = None
-            print(f"Failed to connect to Arduino: {e}")
-    else:
-        ser = None
-        print("Arduino not found.")
-
-initialize_serial_connection()
+    return bool(extract_features(landmarks_to_array(landmarks)).open)
 
 def map_value(x, in_min, in_max, out_min, out_max):
     return int((x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
 
-def send_command():
-    global ser, servo1_pos, servo2_pos, servo3_pos, claw_grabbing
-    servo1_pos = max(0, min(servo1_pos, 180))
-    servo2_pos = max(0, min(servo2_pos, 180))
-    servo3_pos = max(0, min(servo3_pos, 180))
-
-    if claw_grabbing:
-        servo4_pos, servo5_pos = claw_grab_pos
-    else:
-        servo4_pos, servo5_pos = claw_release_pos
-
-    data = struct.pack('HHHHH', servo1_pos, servo2_pos, servo3_pos, servo4_pos, servo5_pos)
-    if ser:
-        try:
-            ser.write(data)
-        except serial.SerialException:
-            print("Serial write failed. Reconnecting...")
-            initialize_serial_connection()
-    else:
-        print("Serial connection not initialized. Reconnecting...")
-        initialize_serial_connection()
-        
-def start_hand_tracker():
-    global cap, servo1_pos, servo2_pos, servo3_pos, claw_grabbing
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
+def on_hand_result(frame):
+    global baseline_angle, previous_claw_state
+    results = frame.results
+    if not results.multi_hand_landmarks:
+        smoother.reset()
         return
 
-    dial_angle = 0
+    points = landmarks_to_array(results.multi_hand_landmarks[0].landmark)
+    if landmark_log is not None:
+        landmark_log.append((frame.t_capture, points))
+    record_array("landmarks", points)
+    if HAND_SMOOTHING:
+        points = smoother(points, frame.t_capture)
+    features = extract_features(points)
+
+    claw_grabbing = claw_gate.update(int(features.curled), float(features.spread))
+
+    if claw_grabbing != previous_claw_state:
+        print(f"Claw state: {'Grabbing' if claw_grabbing else 'Releasing'}")
+        previous_claw_state = claw_grabbing
+
+    wrist_x, wrist_y = features.wrist
+    middle_x, _ = features.middle_tip
+    current_angle = float(features.angle)
+
+    if baseline_angle is None:
+        baseline_angle = current_angle
+
+    dial_angle = current_angle - baseline_angle
+    dial_angle = (dial_angle + 180) % 360 - 180
+
+    # Sent through the shared arbiter, so higher-priority modes keep the
+    # axes they own while the hand is in view. servo2 is the claw and
+    # follows claw_grabbing.
+    get_arbiter().submit(
+        "hand",
+        servo1=map_value(dial_angle, -180, 180, 0, 180),
+        servo3=map_value(middle_x, 0, 1, 170, 10),
+        claw_grabbing=claw_grabbing,
+    )
+    frame.t_command = time.perf_counter()
+
+    height, width = frame.shape[:2]
+    frame.overlay = ((int(width * wrist_x), int(height * wrist_y)), dial_angle)
+
+def draw_hand_overlay(frame):
+    if frame.overlay is None:
+        return
+    image = frame.image
+    center, dial_angle = frame.overlay
+    cv2.ellipse(image, center, (50, 50), -90, 0, dial_angle, (255, 0, 0), 5)
+    cv2.putText(image, f'{int(dial_angle)}', (center[0], center[1] - 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 0, 0), 3, cv2.LINE_AA)
+
+    mp_drawing.draw_landmarks(
+        image,
+        frame.results.multi_hand_landmarks[0],
+        mp_hands.HAND_CONNECTIONS,
+        mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=5, circle_radius=5),
+        mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=5))
+
+def start_hand_tracker(source=0, display=True, realtime=False, headless=False, roi=HAND_ROI,
+                       adaptive=HAND_ADAPTIVE_SCALE):
+    # Blocks until stopped; stop_hand_tracker() may be called from any thread.
+    # headless skips drawing, the preview window and the BGR round trip.
+    global pipeline, baseline_angle, previous_claw_state, roi_hands
     baseline_angle = None
     previous_claw_state = None
+    smoother.reset()
+    claw_gate.grabbing = state.pose.claw_grabbing
 
-    while True:
-        ret, image = cap.read()
-        if not ret:
-            print("Error: Could not read frame from webcam.")
-            continue
-
-        image = cv2.flip(image, 1)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = hands.process(image_rgb)
-
-        image = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
-        hand_landmarks_list = results.multi_hand_landmarks if results.multi_hand_landmarks else []
-
-        if hand_landmarks_list:
-            hand_landmarks = hand_landmarks_list[0].landmark
-
-            hand_open = is_hand_open(hand_landmarks)
-            hand_fist = is_fist(hand_landmarks)
-
-            if hand_fist and not claw_grabbing:
-                claw_grabbing = True
-            elif hand_open and claw_grabbing:
-                claw_grabbing = False
-
-            if claw_grabbing != previous_claw_state:
-                print(f"Claw state: {'Grabbing' if claw_grabbing else 'Releasing'}")
-                previous_claw_state = claw_grabbing
-
-            wrist = hand_landmarks[mp_hands.HandLandmark.WRIST]
-            middle_tip = hand_landmarks[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-
-            dx = middle_tip.x - wrist.x
-            dy = middle_tip.y - wrist.y
-            current_angle = np.arctan2(dy, dx) * 180 / np.pi
-
-            if baseline_angle is None:
-                baseline_angle = current_angle
-
-            dial_angle = current_angle - baseline_angle
-            dial_angle = (dial_angle + 180) % 360 - 180
-
-            center = (int(image.shape[1] * wrist.x), int(image.shape[0] * wrist.y))
-            cv2.ellipse(image, center, (50, 50), -90, 0, dial_angle, (255, 0, 0), 5)
-            cv2.putText(image, f'{int(dial_angle)}', (center[0], center[1] - 60),
-                        cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 0, 0), 3, cv2.LINE_AA)
-
-            servo1_pos = map_value(dial_angle, -180, 180, 0, 180)
-            hand_pos_y = wrist.y * image.shape[0]
-            hand_pos_x = middle_tip.x * image.shape[1]
-            servo2_pos = map_value(hand_pos_y, 0, image.shape[0], 10, 170)
-            servo3_pos = map_value(hand_pos_x, 0, image.shape[1], 170, 10)
-            send_command()
-
-            mp_drawing.draw_landmarks(
-                image,
-                results.multi_hand_landmarks[0],
-                mp_hands.HAND_CONNECTIONS,
-                mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=5, circle_radius=5),
-                mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=5))
-
-        cv2.imshow('Hand Tracker', image)
-        if cv2.waitKey(1) & 0xFF == 27:
-            break
+    if roi and roi_hands is None:
+        roi_hands = mp_hands.Hands(static_image_mode=True, min_detection_confidence=0.7)
 
-    cap.release()
-    cv2.destroyAllWindows()
+    pipeline = HandPipeline(source, roi_hands if roi else hands, on_hand_result, draw_hand_overlay,
+                            display=display, realtime=realtime, headless=headless,
+                            roi=RoiTracker() if roi else None,
+                            scaler=AdaptiveScaler(HAND_TARGET_FPS) if adaptive else None)
+    if not pipeline.run():
+        print("Error: Could not open webcam." if source == 0 else f"Error: Could not open {source}.")
+    return pipeline
 
 def stop_hand_tracker():
-    global cap
-    if cap:
-        cap.release()
-        cap = None
-    cv2.destroyAllWindows()
\ No newline at end of file
+    if pipeline is not None:
+        pipeline.stop()
+
+def _report(name, p, elapsed):
+    frames = p.stats["inference"].frames
+    print(f"[Hand Tracker] {name}: {frames} frames in {elapsed:.2f}s ({frames / elapsed:.1f} fps)")
+    for k, v in p.report().items():
+        print(f"  {k:26} {v:.2f}" if isinstance(v, float) else f"  {k:26} {v}")
+
+def main():
+    ap = argparse.ArgumentParser("Benchmark the hand tracking pipeline on a recorded clip")
+    ap.add_argument("video", help="Video file to replay instead of the webcam")
+    ap.add_argument("--display", action="store_true", help="Show the annotated frames")
+    ap.add_argument("--headless", action="store_true", help="Skip drawing, display and the BGR round trip")
+    ap.add_argument("--compare", action="store_true", help="Run the clip with rendering and then headless")
+    ap.add_argument("--no-roi", action="store_true", help="Always run inference on the full frame")
+    ap.add_argument("--no-scale", action="store_true", help="Keep inference at full resolution when behind")
+    ap.add_argument("--fast", action="store_true", help="Read the clip as fast as possible instead of at its frame rate")
+    ap.add_argument("--save-landmarks", metavar="NPZ", help="Write the raw landmark trace for offline tuning")
+    args = ap.parse_args()
+
+    global landmark_log
+    if args.save_landmarks:
+        landmark_log = []
+
+    modes = [("rendered", False), ("headless", True)] if args.compare else [
+        ("headless" if args.headless else "rendered", args.headless)]
+    for name, headless in modes:
+        t0 = time.perf_counter()
+        p = start_hand_tracker(args.video, display=args.display, realtime=not args.fast,
+                               headless=headless, roi=not args.no_roi, adaptive=not args.no_scale)
+        _report(name, p, time.perf_counter() - t0)
+
+    if landmark_log:
+        t, points = zip(*landmark_log)
+        np.savez(args.save_landmarks, t=np.array(t), points=np.stack(points))
+        print(f"[Hand Tracker] saved {len(points)} landmark frames to {args.save_landmarks}")
+
+if __name__ == "__main__":
+    sys.exit(main())
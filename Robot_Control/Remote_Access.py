@@ -1,23 +1,3 @@
-import serial
+from serial_link import get_link
 
-def find_arduino_port():
-    ports = list(serial.tools.list_ports.comports())
-    for port in ports:
-        if 'Arduino' in port.description or 'usbmodem' in port.device:
-            return port.device
-    return None
-
-def initialize_serial_connection():
-    global ser
-    port = find_arduino_port()
-    if port:
-        try:
-            ser = serial.Serial(port, 9600)
-        except Exception as e:
-            ser = None
-            print(f"Failed to connect to Arduino: {e}")
-    else:
-        ser = None
-        print("Arduino not found.")
-
-initialize_serial_connection()
\ No newline at end of file
+link = get_link()
@@ -1,47 +1,145 @@
 #include <Servo.h>
 
+// Protocol v2, see protocol.py for the reference decoder.
+//   v1: FF lo1 hi1 lo2 hi2 lo3 hi3
+//   v2: FE hdr a1..an crc      hdr = count << 5 | seq, crc = CRC-8/0x07
+//   v2 control: FE hdr(count=0) op arg crc
+const byte SYNC_V1 = 0xFF;
+const byte SYNC_V2 = 0xFE;
+const byte OP_SET_BAUD = 0x01;
+const byte OP_ACK = 0x02;
+const long BAUD_RATES[] = {9600, 57600, 115200, 250000, 500000, 1000000};
+const byte NUM_BAUD_RATES = sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]);
+const long DEFAULT_BAUD = 115200;
+
 Servo wristServo;
 Servo clawServo;
 Servo elbowServo;
 
 int wristPos = 90;
-int clawPos = 140; 
+int clawPos = 140;
 int elbowPos = 90; // start open
 
-void setup() {
-  wristServo.attach(11);  // wrist/spin servo
-  clawServo.attach(12);   // claw servo
-  elbowServo.attach(13);  // elbow servo
+byte buf[10];
+byte bufLen = 0;
+byte txSeq = 0;
+
+byte crc8(const byte *data, byte len) {
+  byte crc = 0;
+  for (byte i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (byte b = 0; b < 8; b++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void dropBytes(byte n) {
+  for (byte i = n; i < bufLen; i++) {
+    buf[i - n] = buf[i];
+  }
+  bufLen -= n;
+}
+
+void applyPose(int wrist, int claw, int elbow) {
+  wristPos = constrain(wrist, 0, 180);
+  clawPos  = constrain(claw, 0, 180);
+  elbowPos = constrain(elbow, 0, 180);
 
   wristServo.write(wristPos);
   clawServo.write(clawPos);
   elbowServo.write(elbowPos);
+}
 
-  Serial.begin(9600);
+void handleControl(byte op, byte arg) {
+  if (op == OP_SET_BAUD && arg < NUM_BAUD_RATES) {
+    byte ack[5] = {SYNC_V2, (byte)(txSeq++ & 0x1F), OP_ACK, arg, 0};
+    ack[4] = crc8(ack + 1, 3);
+    Serial.write(ack, 5);
+    Serial.flush();
+    Serial.end();
+    Serial.begin(BAUD_RATES[arg]);
+  }
 }
 
-void loop() {
-  if (Serial.available() >= 7) {
-    byte startByte = Serial.read();
+// Returns true when a frame was consumed and the buffer should be parsed again.
+bool parseFrame() {
+  if (bufLen == 0) {
+    return false;
+  }
 
-    // Ignore garbage until we find the packet start marker
-    if (startByte != 255) {
-      return;
+  if (buf[0] == SYNC_V1) {
+    if (bufLen < 7) {
+      return false;
+    }
+    int wrist = buf[1] | (buf[2] << 8);
+    int claw  = buf[3] | (buf[4] << 8);
+    int elbow = buf[5] | (buf[6] << 8);
+    if (wrist <= 180 && claw <= 180 && elbow <= 180) {
+      applyPose(wrist, claw, elbow);
+      dropBytes(7);
+    } else {
+      dropBytes(1);
     }
+    return true;
+  }
 
-    byte buffer[6];
-    Serial.readBytes(buffer, 6);
+  if (buf[0] == SYNC_V2) {
+    if (bufLen < 2) {
+      return false;
+    }
+    byte count = buf[1] >> 5;
+    byte size = count == 0 ? 5 : count + 3;
+    if (bufLen < size) {
+      return false;
+    }
 
-    wristPos = buffer[0] | (buffer[1] << 8);
-    clawPos  = buffer[2] | (buffer[3] << 8);
-    elbowPos = buffer[4] | (buffer[5] << 8);
+    bool valid = crc8(buf + 1, size - 2) == buf[size - 1];
+    for (byte i = 0; valid && count > 0 && i < count; i++) {
+      valid = buf[2 + i] <= 180;
+    }
+    if (!valid) {
+      dropBytes(1);
+      return true;
+    }
+
+    if (count == 0) {
+      byte op = buf[2];
+      byte arg = buf[3];
+      dropBytes(size);
+      handleControl(op, arg);
+    } else {
+      // Extra servos in a batched frame belong to older arm layouts.
+      applyPose(buf[2],
+                count > 1 ? buf[3] : clawPos,
+                count > 2 ? buf[4] : elbowPos);
+      dropBytes(size);
+    }
+    return true;
+  }
+
+  // Ignore garbage until we find a packet start marker
+  dropBytes(1);
+  return true;
+}
+
+void setup() {
+  wristServo.attach(11);  // wrist/spin servo
+  clawServo.attach(12);   // claw servo
+  elbowServo.attach(13);  // elbow servo
+
+  wristServo.write(wristPos);
+  clawServo.write(clawPos);
+  elbowServo.write(elbowPos);
 
-    wristPos = constrain(wristPos, 0, 180);
-    clawPos  = constrain(clawPos, 0, 180);
-    elbowPos = constrain(elbowPos, 0, 180);
+  Serial.begin(DEFAULT_BAUD);
+}
 
-    wristServo.write(wristPos);
-    clawServo.write(clawPos);
-    elbowServo.write(elbowPos);
+void loop() {
+  while (Serial.available() > 0 && bufLen < sizeof(buf)) {
+    buf[bufLen++] = Serial.read();
+    while (parseFrame()) {
+    }
   }
-}
\ No newline at end of file
+}
@@ -1,91 +1,51 @@
 import tkinter as tk
 from logo import ascii_art
 import Hand_Tracker
-import hid
 from pynput import mouse
-import struct
-import serial
-import serial.tools.list_ports
 import threading
-import queue
-import json
 import time
-import hid
-import sounddevice as sd
-from vosk import Model, KaldiRecognizer
+import model_cache
 from voice_movement import handle_command
+from voice_engine import VoiceEngine, new_recognizer
+from vad import EnergyVad
+from arbiter import frame, get_stream
+from robot_state import get_state
+from telemetry import TELEMETRY_HZ, TelemetryPanel
+from splash import SPLASH_MODE, Splash
+from joystick import AXIS_MAX, JoystickReader
+from mouse_sampler import MOUSE_HZ, MouseSampler
 
 # GLOBAL STATE
 tracking_mouse = False
 tracking_hand = False
 
-mouse_x, mouse_y = 0, 0
+mouse_sampler = None   # latest cursor position, sampled at MOUSE_HZ
 
-servo1_pos = 90
-servo2_pos = 140
-servo3_pos = 90
+# Servo pose and claw flag shared with every input mode (see robot_state.py)
+state = get_state()
 
 listener = None
-ser = None
-serial_lock = threading.Lock()
+link = None
+stream = None    # the single serial command stream shared by every mode
+arbiter = None
 
-claw_grabbing = False
-claw_busy = False
-
-CLAW_OPEN_POS = 160
-CLAW_CLOSED_POS = 60
+HAND_HEADLESS = False  # True on the arm's monitor-less controller
 
 # JOYSTICK CONTROL
 tracking_joystick = False
-joystick_thread = None
-joystick_running = threading.Event()
-
-JOYSTICK_VID = 0x046D
-JOYSTICK_PID = 0xC215
+joystick_reader = None
 
 joystick_x = 0
 joystick_y = 0
 joystick_button = 0
 
-last_joystick_send_time = 0
-JOYSTICK_SEND_INTERVAL = 0.03  # about 33 commands per second
 
 # Voice
 voice_thread = None
 voice_running = threading.Event()
-VOICE_SAMPLE_RATE = 16_000
-VOICE_BLOCK_LEN = 8_000
 VOICE_MODEL_DIR = "models/vosk-model-small-en-us-0.15"
 
 # HELPERS
-def clamp(val, lo=0, hi=180):
-    return max(lo, min(int(val), hi))
-
-
-def find_arduino_port():
-    ports = list(serial.tools.list_ports.comports())
-    for port in ports:
-        if 'Arduino' in port.description or 'usbmodem' in port.device:
-            return port.device
-    return None
-
-
-def initialize_serial_connection():
-    global ser
-    port = find_arduino_port()
-    if port:
-        try:
-            ser = serial.Serial(port, 9600, timeout=1)
-            print(f"Connected to Arduino on {port}")
-            time.sleep(2)
-        except Exception as e:
-            ser = None
-            print(f"Failed to connect to Arduino: {e}")
-    else:
-        ser = None
-        print("Arduino not found.")
-
-
 def map_value(x, in_min, in_max, out_min, out_max):
     if in_max == in_min:
         return out_min
@@ -93,106 +53,53 @@ def map_value(x, in_min, in_max, out_min, out_max):
 
 
 def send_command():
-    global ser, servo1_pos, servo2_pos, servo3_pos
-
-    s1 = clamp(servo1_pos)
-    s2 = clamp(servo2_pos)
-    s3 = clamp(servo3_pos)
-
-    data = struct.pack('<BHHH', 255, s1, s2, s3)
-
-    if ser:
-        try:
-            with serial_lock:
-                ser.write(data)
-        except serial.SerialException:
-            print("Serial write failed. Reconnecting...")
-            initialize_serial_connection()
-    else:
-        print("Serial connection not initialized. Reconnecting...")
-        initialize_serial_connection()
+    # Re-send the shared pose as is; input modes go through arbiter.submit().
+    stream.streamer.set_target(frame(state.pose))
 
 
-def update_telemetry():
-    mouse_pos_label.config(text=f"Mouse Position: ({mouse_x}, {mouse_y})")
-    servo_pos_label.config(
-        text=f"Servo Positions: (Servo1: {servo1_pos}, Servo2/Claw: {servo2_pos}, Servo3: {servo3_pos})"
-    )
-    claw_state_label.config(text=f"Claw State: {'Grabbing' if claw_grabbing else 'Released'}")
-
-    if 'joystick_pos_label' in globals():
-        joystick_pos_label.config(text=f"Joystick Position: ({joystick_x}, {joystick_y})")
-
-def load_text_character_by_character(widget, text, index=0, delay=50):
-    if index < len(text):
-        if isinstance(widget, tk.Text):
-            widget.configure(state='normal')
-            widget.insert(tk.END, text[index])
-            widget.configure(state='disabled')
-            widget.see(tk.END)
-        elif isinstance(widget, tk.Label):
-            current_text = widget.cget("text")
-            widget.configure(text=current_text + text[index])
-
-        widget.after(delay, lambda: load_text_character_by_character(widget, text, index + 1, delay))
+def servo_text():
+    pose = state.pose
+    return f"Servo Positions: (Servo1: {pose.servo1}, Servo2/Claw: {pose.servo2}, Servo3: {pose.servo3})"
 
 # CLAW CONTROL
-def set_claw_position(target):
-    global servo2_pos
-    servo2_pos = clamp(target)
-    update_telemetry()
-    send_command()
+def set_claw(grabbing):
+    # The arbiter turns the flag into CLAW_CLOSED_POS / CLAW_OPEN_POS on servo2.
+    arbiter.submit("claw", claw_grabbing=grabbing)
 
 
 def close_claw():
-    global claw_busy, claw_grabbing
-
-    if claw_busy:
+    if not state.claw_lock.acquire(blocking=False):
         return
-
-    claw_busy = True
-    claw_grabbing = True
-    set_claw_position(CLAW_CLOSED_POS)
-
-    claw_busy = False
+    try:
+        set_claw(True)
+    finally:
+        state.claw_lock.release()
 
 
 def open_claw():
-    global claw_busy, claw_grabbing
-
-    if claw_busy:
+    if not state.claw_lock.acquire(blocking=False):
         return
-
-    claw_busy = True
-    claw_grabbing = False
-
-    set_claw_position(CLAW_OPEN_POS)
-
-    claw_busy = False
+    try:
+        set_claw(False)
+    finally:
+        state.claw_lock.release()
 
 
 def toggle_claw():
-    if claw_busy:
+    if state.claw_lock.locked():
         return
 
-    if claw_grabbing:
-        threading.Thread(target=open_claw, daemon=True).start()
+    # submit() only takes the arbiter lock, so no thread is needed
+    if state.pose.claw_grabbing:
+        open_claw()
     else:
-        threading.Thread(target=close_claw, daemon=True).start()
+        close_claw()
 
 
 
 # MOUSE CONTROL
-def on_move(x, y):
-    global mouse_x, mouse_y, servo1_pos, servo3_pos
-
-    if tracking_mouse:
-        mouse_x, mouse_y = x, y
-        servo1_pos = clamp(map_value(mouse_x, 0, 1920, 10, 170))
-        servo3_pos = clamp(map_value(mouse_y, 0, 1920, 10, 170))
-
-        update_telemetry()
-        send_command()
+def submit_mouse(servo1, servo3):
+    arbiter.submit("mouse", servo1=servo1, servo3=servo3)
 
 
 def on_click(x, y, button, pressed):
@@ -208,7 +115,10 @@ def start_mouse_tracking():
         return
 
     tracking_mouse = True
-    listener = mouse.Listener(on_move=on_move, on_click=on_click)
+    # The listener callback only stores the position; mapping and the
+    # arbiter submit happen on the sampler's scheduler tick.
+    mouse_sampler.start()
+    listener = mouse.Listener(on_move=mouse_sampler.on_move, on_click=on_click)
     listener.start()
 
     activate_mouse_button.config(state="disabled")
@@ -223,134 +133,53 @@ def stop_mouse_tracking():
     if listener is not None:
         listener.stop()
         listener = None
+    mouse_sampler.stop()
 
     activate_mouse_button.config(state="normal")
     deactivate_mouse_button.config(state="disabled")
 
 # JOYSTICK CONTROL
-def list_hid_devices():
-    print("Listing all HID devices:")
-    for device in hid.enumerate():
-        print(
-            f"VID: {hex(device['vendor_id'])}, "
-            f"PID: {hex(device['product_id'])}, "
-            f"Product: {device['product_string']}"
-        )
-
-def find_joystick_device():
-    for device in hid.enumerate():
-        vid = device["vendor_id"]
-        pid = device["product_id"]
-        product = device.get("product_string", "")
-
-        if vid == JOYSTICK_VID and pid == JOYSTICK_PID:
-            print(f"Found joystick: {product}")
-            print(f"Path: {device['path']}")
-            return device
-
-    return None
-
-def joystick_worker():
-    global tracking_joystick
+def on_joystick_report(report):
     global joystick_x, joystick_y, joystick_button
-    global servo1_pos, servo3_pos
-    global last_joystick_send_time
-
-    joystick = None
-
-    try:
-        list_hid_devices()
-
-        print(f"Looking for joystick: VID={hex(JOYSTICK_VID)}, PID={hex(JOYSTICK_PID)}")
-
-        device_info = find_joystick_device()
-
-        if device_info is None:
-            print("[Joystick] device not found.")
-            return
-
-        joystick = hid.device()
-
-        # More reliable on macOS than joystick.open(VID, PID)
-        joystick.open_path(device_info["path"])
 
-        print(f"Connected to joystick: {joystick.get_product_string()}")
-        print("Joystick control active.")
-
-        while joystick_running.is_set():
-            data = joystick.read(64, timeout_ms=50)
-
-            if not data:
-                continue
-
-            print(f"Raw Joystick Data: {data}")
-
-            joystick_x = data[0]
-            joystick_y = data[1]
-
-            new_servo1 = clamp(map_value(joystick_x, 0, 255, 10, 170))
-            new_servo3 = clamp(map_value(joystick_y, 0, 255, 10, 170))
-
-            if abs(new_servo1 - servo1_pos) < 2 and abs(new_servo3 - servo3_pos) < 2:
-                continue
-
-            servo1_pos = new_servo1
-            servo3_pos = new_servo3
-
-            now = time.time()
-            if now - last_joystick_send_time >= JOYSTICK_SEND_INTERVAL:
-                root.after(0, update_telemetry)
-                send_command()
-                last_joystick_send_time = now
-
-    except Exception as e:
-        print(f"[Joystick] error: {e}")
-
-    finally:
-        tracking_joystick = False
-        joystick_running.clear()
-
-        if joystick is not None:
-            try:
-                joystick.close()
-                print("Joystick connection closed.")
-            except Exception:
-                pass
-
-        root.after(0, lambda: activate_joystick_button.config(state="normal"))
-        root.after(0, lambda: deactivate_joystick_button.config(state="disabled"))
+    joystick_x, joystick_y = report.x, report.y
+    arbiter.submit(
+        "joystick",
+        servo1=map_value(joystick_x, 0, AXIS_MAX, 10, 170),
+        servo3=map_value(joystick_y, 0, AXIS_MAX, 10, 170),
+    )
 
-        print("Joystick control stopped.")
+    # The trigger toggles the claw on press, like a mouse click
+    if report.pressed(1) and not joystick_button & 1:
+        toggle_claw()
+    joystick_button = report.buttons
 
 
 def start_joystick_tracking():
-    global tracking_joystick, joystick_thread
+    global tracking_joystick, joystick_reader
 
     if tracking_joystick:
         return
 
-    # Stop other live control modes so they do not fight each other
-    if tracking_mouse:
-        stop_mouse_tracking()
-
-    if tracking_hand:
-        stop_hand_tracking()
-
+    # Other modes keep running; the arbiter gives the joystick the axes it
+    # outranks them on. The reader waits for the stick and re-attaches
+    # if it is unplugged.
     tracking_joystick = True
-    joystick_running.set()
-
-    joystick_thread = threading.Thread(target=joystick_worker, daemon=True)
-    joystick_thread.start()
+    joystick_reader = JoystickReader(on_joystick_report)
+    joystick_reader.start()
 
     activate_joystick_button.config(state="disabled")
     deactivate_joystick_button.config(state="normal")
 
 
 def stop_joystick_tracking():
-    global tracking_joystick
+    global tracking_joystick, joystick_reader
 
     tracking_joystick = False
-    joystick_running.clear()
+    if joystick_reader is not None:
+        joystick_reader.stop()
+        joystick_reader = None
+        print("Joystick control stopped.")
 
     activate_joystick_button.config(state="normal")
     deactivate_joystick_button.config(state="disabled")
@@ -359,10 +188,19 @@ def stop_joystick_tracking():
 def start_hand_tracking():
     global tracking_hand
     tracking_hand = True
-    Hand_Tracker.start_hand_tracker()
     activate_hand_button.config(state="disabled")
     deactivate_hand_button.config(state="normal")
 
+    if HAND_HEADLESS:
+        # No preview window, so the tracker can run off the Tk thread.
+        threading.Thread(
+            target=Hand_Tracker.start_hand_tracker,
+            kwargs={"headless": True},
+            daemon=True,
+        ).start()
+    else:
+        Hand_Tracker.start_hand_tracker()
+
 
 def stop_hand_tracking():
     global tracking_hand
@@ -385,41 +223,20 @@ def stop_hand_tracking():
 # VOICE CONTROL
 def voice_worker():
     try:
-        model = Model(VOICE_MODEL_DIR)
-        rec = KaldiRecognizer(model, VOICE_SAMPLE_RATE)
-        rec.SetWords(True)
+        engine = VoiceEngine(new_recognizer(VOICE_MODEL_DIR), handle_command, vad=EnergyVad())
     except Exception as e:
         print("[Voice] model load error:", e)
         return
 
-    q_audio: queue.Queue[bytes] = queue.Queue()
-
-    def audio_cb(indata, status):
-        if status:
-            print(status)
-        q_audio.put(bytes(indata))
-
-    print("[Voice] model loaded – listening")
+    st = model_cache.stats(VOICE_MODEL_DIR)
+    print(f"[Voice] listening (model loaded once in {st['load_s']:.2f}s, +{st['rss_mb']:.0f} MB)")
     try:
-        with sd.RawInputStream(
-            samplerate=VOICE_SAMPLE_RATE,
-            blocksize=VOICE_BLOCK_LEN,
-            dtype="int16",
-            channels=1,
-            callback=audio_cb,
-        ):
-            while voice_running.is_set():
-                data = q_audio.get()
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get("text", "").strip()
-                    if text:
-                        print(f">> {text}")
-                        handle_command(text.split())
+        engine.run_live(voice_running)
     except Exception as e:
         print("[Voice] error:", e)
 
-    print("[Voice] stopped")
+    st = engine.vad.stats()
+    print(f"[Voice] stopped ({100 * st['forwarded_ratio']:.0f}% of audio passed the VAD)")
 
 
 def start_voice():
@@ -442,7 +259,9 @@ def stop_voice():
     deactivate_voice_btn.config(state="disabled")
 
 # UI
-initialize_serial_connection()
+stream = get_stream()
+arbiter = stream.arbiter
+link = stream.link
 
 root = tk.Tk()
 root.title("Robot Control")
@@ -451,6 +270,13 @@ root.configure(bg='black')
 
 text_color = "#00ff00"
 
+# Map the cursor across the real screen, not a fixed 1920 on both axes
+mouse_sampler = MouseSampler(
+    submit_mouse,
+    (root.winfo_screenwidth(), root.winfo_screenheight()),
+    MOUSE_HZ,
+)
+
 title_label = tk.Label(
     root,
     font=("Courier New", 10),
@@ -555,7 +381,7 @@ joystick_pos_label.pack(pady=10)
 
 servo_pos_label = tk.Label(
     root,
-    text=f"Servo Positions: (Servo1: {servo1_pos}, Servo2/Claw: {servo2_pos})",
+    text=servo_text(),
     bg='black',
     fg=text_color
 )
@@ -569,9 +395,28 @@ claw_state_label = tk.Label(
 )
 claw_state_label.pack(pady=10)
 
-root.after(1000, lambda: load_text_character_by_character(title_label, ascii_art, 0, 1))
+serial_state_label = tk.Label(
+    root,
+    text="Arduino: Disconnected",
+    bg='black',
+    fg=text_color
+)
+serial_state_label.pack(pady=10)
+
+telemetry = TelemetryPanel(root, TELEMETRY_HZ)
+telemetry.add(mouse_pos_label, lambda: "Mouse Position: ({}, {})".format(*mouse_sampler.position))
+telemetry.add(joystick_pos_label, lambda: f"Joystick Position: ({joystick_x}, {joystick_y})")
+telemetry.add(servo_pos_label, servo_text)
+telemetry.add(claw_state_label, lambda: f"Claw State: {'Grabbing' if state.pose.claw_grabbing else 'Released'}")
+telemetry.add(serial_state_label, lambda: f"Arduino: {'Connected' if link.is_connected else 'Disconnected'}")
 
-update_telemetry()
+# Load the speech model while the splash plays so voice start is instant
+model_cache.preload(VOICE_MODEL_DIR)
+
+telemetry.start()
 send_command()
 
+# "instant" shows the logo at once; "lines" reveals it in a few frames
+Splash(title_label, ascii_art, SPLASH_MODE).start(delay_ms=1000)
+
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import argparse, json, sys, threading, time
+from pathlib import Path
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+from scheduler import SKIP, Scheduler, Task, get_scheduler
+
+HERE = Path(__file__).resolve().parent
+ANIMATION_DIR = HERE.parent / "Robot_Animations"
+
+# voice_movement pose layout
+AXES = ("pan", "tilt", "level", "claw_a", "claw_b")
+DEFAULT_RATE_HZ = 50
+EASINGS = ("step", "linear", "smooth")
+
+# Animation frames go straight to the serial writer, so compile bounds each
+# axis to what the servos can follow; the claw pair is a state, not a joint.
+MAX_VEL = (600.0, 600.0, 600.0, float("inf"), float("inf"))   # deg/s
+
+
+class Animation(NamedTuple):
+    name: str
+    rate_hz: float
+    frames: np.ndarray     # (n, axes) per-tick poses; NaN = axis left to the live input
+    relative: np.ndarray   # (axes,) bool, frames hold offsets from the start pose
+    weight: np.ndarray     # (n,) blend weight of the animation over the live input
+
+    @property
+    def duration(self) -> float:
+        return (len(self.frames) - 1) / self.rate_hz
+
+
+def compile_animation(
+    spec: dict,
+    axes: Sequence[str] = AXES,
+    vmax: Sequence[float] = MAX_VEL,
+) -> Animation:
+    # Keyframes -> one row per control tick. Each keyframe sets some axes
+    # at time t; "ease" says how the segment leading into it is filled in.
+    # Moves faster than vmax are slew-limited here, so the frames are
+    # exactly what the arm will do.
+    rate = float(spec.get("rate_hz", DEFAULT_RATE_HZ))
+    keys = sorted(spec["keyframes"], key=lambda k: k["t"])
+    duration = keys[-1]["t"]
+    n = int(round(duration * rate)) + 1
+    t = np.arange(n) / rate
+
+    frames = np.full((n, len(axes)), np.nan)
+    for j, axis in enumerate(axes):
+        pts = [(k["t"], k["pose"][axis], k.get("ease", "linear")) for k in keys if axis in k["pose"]]
+        if not pts:
+            continue
+        kt = np.array([p[0] for p in pts])
+        kv = np.array([p[1] for p in pts], dtype=float)
+        ease = [p[2] for p in pts]
+        for e in ease:
+            if e not in EASINGS:
+                raise ValueError(f"{spec.get('name', '?')}: unknown ease {e!r}")
+
+        # segment i runs from key i-1 to key i; before/after the keys hold
+        seg = np.clip(np.searchsorted(kt, t, side="right"), 1, len(kt) - 1) if len(kt) > 1 else None
+        if seg is None:
+            frames[:, j] = kv[0]
+            continue
+        t0, t1 = kt[seg - 1], kt[seg]
+        u = np.clip((t - t0) / np.maximum(t1 - t0, 1e-9), 0.0, 1.0)
+        mode = np.array(ease)[seg]
+        u = np.where(mode == "smooth", u * u * (3 - 2 * u), u)
+        u = np.where(mode == "step", (u >= 1.0).astype(float), u)
+        frames[:, j] = kv[seg - 1] + u * (kv[seg] - kv[seg - 1])
+        frames[t < kt[0], j] = kv[0]
+
+    # Per-tick slew limit; sequential, but only run once per file.
+    step = np.asarray(vmax, dtype=float)[:len(axes)] / rate
+    for i in range(1, n):
+        prev, cur = frames[i - 1], frames[i]
+        ok = ~np.isnan(prev) & ~np.isnan(cur)
+        frames[i, ok] = prev[ok] + np.clip(cur[ok] - prev[ok], -step[ok], step[ok])
+
+    relative = np.array([a in spec.get("relative", ()) for a in axes])
+
+    # Fade the animation in and out over the live input
+    weight = np.ones(n)
+    blend = float(spec.get("blend", 0.0))
+    if blend > 0:
+        ramp = np.minimum(1.0, np.minimum(t, duration - t) / blend)
+        weight = np.clip(ramp, 0.0, 1.0)
+
+    return Animation(spec.get("name", "animation"), rate, frames, relative, weight)
+
+
+_cache: dict[Path, tuple[float, Animation]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_animation(name: str | Path, axes: Sequence[str] = AXES) -> Animation:
+    # Compiled once per file and reused until the file changes.
+    path = Path(name)
+    if path.suffix != ".json":
+        path = ANIMATION_DIR / f"{name}.json"
+    path = path.resolve()
+    mtime = path.stat().st_mtime
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    anim = compile_animation(json.loads(path.read_text()), axes)
+    with _cache_lock:
+        _cache[path] = (mtime, anim)
+    return anim
+
+
+class Playback:
+    # One run of an animation on the scheduler. The frame is picked from
+    # elapsed time, so a late tick skips ahead instead of stretching the
+    # motion; the per-tick work is a single blend with the live pose.
+    # Axes the frame does not drive are emitted as None, so the caller
+    # can leave them to the live input instead of claiming them.
+
+    def __init__(
+        self,
+        anim: Animation,
+        emit: Callable[[tuple], None],
+        live: Callable[[], Sequence[float]],
+        on_done: Callable[[bool], None] | None = None,
+    ):
+        self.anim = anim
+        self._emit = emit
+        self._live = live
+        self._on_done = on_done
+        self._origin = np.asarray(live(), dtype=float)
+        # Resolve relative axes once; NaN axes are not driven.
+        self._frames = anim.frames + np.where(anim.relative, self._origin, 0.0)
+        self._mask = ~np.isnan(self._frames)
+        self._frames = np.nan_to_num(self._frames)
+        self._t0: float | None = None
+        self._last = -1
+        self.task: Task | None = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.cancelled = False
+        self._finished = False
+        self._finish_lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None and self.task.active
+
+    def __call__(self, now: float):
+        if self._t0 is None:
+            self._t0 = now
+        i = int((now - self._t0) * self.anim.rate_hz + 0.5)
+        last = len(self._frames) - 1
+        if i > last:
+            i = last
+        if i <= self._last:
+            return None
+        self.frames_skipped += i - self._last - 1
+        self._last = i
+
+        live = np.asarray(self._live(), dtype=float)
+        w = self.anim.weight[i]
+        pose = live + w * (self._frames[i] - live)
+        self._emit(tuple(int(round(v)) if m else None for v, m in zip(pose, self._mask[i])))
+        self.frames_sent += 1
+        if i == last:
+            self._finish(False)
+            return False
+
+    def _finish(self, cancelled: bool):
+        # The last tick and cancel() can race; on_done runs once either way.
+        with self._finish_lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.cancelled = cancelled
+        if self._on_done:
+            self._on_done(cancelled)
+
+    def cancel(self):
+        if self.active:
+            self.task.cancel()
+            self._finish(True)
+
+
+def play(
+    anim: Animation,
+    emit: Callable[[tuple], None],
+    live: Callable[[], Sequence[float]],
+    on_done: Callable[[bool], None] | None = None,
+    scheduler: Scheduler | None = None,
+) -> Playback:
+    pb = Playback(anim, emit, live, on_done)
+    pb.task = (scheduler or get_scheduler()).every(1 / anim.rate_hz, pb, SKIP, f"anim:{anim.name}")
+    return pb
+
+
+# BENCHMARK
+def main():
+    ap = argparse.ArgumentParser("Compile a keyframe animation and time its playback")
+    ap.add_argument("animation", nargs="?", default="wave", help="name in Robot_Animations or a .json path")
+    ap.add_argument("--busy", type=int, default=0, help="background threads spinning the CPU during playback")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    anim = load_animation(args.animation)
+    compile_ms = 1000 * (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    load_animation(args.animation)
+    cached_us = 1e6 * (time.perf_counter() - t0)
+
+    stop = threading.Event()
+    def spin():
+        while not stop.is_set():
+            sum(range(10_000))
+    for _ in range(args.busy):
+        threading.Thread(target=spin, daemon=True).start()
+
+    sent: list[tuple[float, tuple]] = []
+    done = threading.Event()
+    sched = Scheduler()
+    sched.start()
+    pb = play(anim, lambda pose: sent.append((time.perf_counter(), pose)),
+              lambda: (90, 90, 90, 10, 170), lambda cancelled: done.set(), sched)
+    done.wait(anim.duration + 2.0)
+    sched.stop()
+    stop.set()
+
+    st = pb.task.stats()
+    span = sent[-1][0] - sent[0][0] if len(sent) > 1 else 0.0
+    print(f"[Animation] {anim.name}: {len(anim.frames)} frames @ {anim.rate_hz:.0f} Hz ({anim.duration:.2f}s)")
+    print(f"  compile_ms       {compile_ms:.2f}  (cached {cached_us:.1f} us)")
+    print(f"  frames           sent {pb.frames_sent}  skipped {pb.frames_skipped}")
+    print(f"  duration_error   {1000 * (span - anim.duration):+.1f} ms")
+    print(f"  jitter           mean {st['jitter_mean_ms']:.2f}  p99 {st['jitter_p99_ms']:.2f}  max {st['jitter_max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from typing import Callable, NamedTuple
+
+from recorder import get_recorder, record
+from robot_state import Pose, RobotState, get_state
+
+AXES = ("servo1", "servo2", "servo3", "claw_grabbing")
+
+# Higher wins an axis; ties go to the most recent intent
+PRIORITY = {
+    "stop":      100,
+    "claw":       50,
+    "voice":      40,
+    "animation":  40,
+    "joystick":   30,
+    "hand":       25,
+    "mouse":      20,
+}
+# Seconds an intent keeps its axes without being refreshed; the pose
+# stays where it was when an owner goes quiet, the axis just opens up.
+TIMEOUT = {
+    "stop":      1.0,
+    "claw":      1.0,
+    "voice":     2.0,
+    "animation": 0.2,
+    "joystick":  0.5,
+    "hand":      0.5,
+    "mouse":     0.5,
+}
+DEFAULT_PRIORITY = 10
+DEFAULT_TIMEOUT = 0.5
+
+# Animations keep the claw pair of the older five-servo arms in their
+# claw_a/claw_b axes; submit_frame() turns it back into claw_grabbing.
+CLAW_GRAB    = (170, 10)
+CLAW_RELEASE = (10, 170)
+
+# The wire carries only the firmware's three servos; servo2 is the claw
+# on this arm, so its moves skip the deadband and rate limit.
+CLAW_AXES     = (1,)
+CLAW_OPEN_POS   = 160
+CLAW_CLOSED_POS = 60
+SEND_DEADBAND = (3, 0, 3)  # hand landmark jitter flickers mapped angles by +-1
+MAX_SEND_HZ   = 50
+TRAJ_MAX_VEL  = (180.0, 10_000.0, 180.0)
+TRAJ_MAX_ACC  = (720.0, 100_000.0, 720.0)
+
+# Sources whose poses are already shaped frame by frame (compile_animation
+# slew-limits them); they bypass the trajectory planner.
+DIRECT_SOURCES = {"animation"}
+
+
+def frame(pose: Pose) -> tuple:
+    return pose.servos
+
+
+def claw_position(grabbing: bool) -> int:
+    return CLAW_CLOSED_POS if grabbing else CLAW_OPEN_POS
+
+
+def animation_pose(pose: Pose) -> tuple:
+    # pose in animation.AXES layout
+    return (*pose.servos, *(CLAW_GRAB if pose.claw_grabbing else CLAW_RELEASE))
+
+
+class Intent(NamedTuple):
+    # One source's claim on one axis
+    source: str
+    value: int | bool
+    priority: int
+    expires: float
+    seq: int
+
+
+class Arbiter:
+    # Every input mode submits intents here instead of writing the pose or
+    # the port. Each axis goes to the highest-priority live claim on it, so
+    # a source only gives up the axes it stops sending. The merged pose is
+    # published to the shared RobotState and only a change reaches emit(),
+    # so concurrent modes produce one command stream with no conflicting
+    # frames.
+
+    def __init__(self, state: RobotState, emit: Callable[[Pose], None]):
+        self.state = state
+        self._emit = emit
+        self._intents: dict[tuple[str, str], Intent] = {}   # (source, axis)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.submitted = 0
+        self.emitted = 0
+        self.overridden = 0
+
+    def submit(
+        self,
+        source: str,
+        priority: int | None = None,
+        timeout: float | None = None,
+        **axes,
+    ) -> Pose | None:
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"unknown axes {sorted(unknown)}")
+        if "claw_grabbing" in axes:
+            # servo2 is the claw: a grab or release is a claim on it too, so
+            # the flag and the servo can never disagree.
+            axes["servo2"] = claw_position(axes["claw_grabbing"])
+        kind = source.split(":")[0]
+        if priority is None:
+            priority = PRIORITY.get(kind, DEFAULT_PRIORITY)
+        if timeout is None:
+            timeout = TIMEOUT.get(kind, DEFAULT_TIMEOUT)
+        rec = get_recorder()
+        if rec is not None:
+            rec.record("intent", [float(axes.get(a, "nan")) for a in AXES], source)
+        with self._lock:
+            self.submitted += 1
+            self._seq += 1
+            now = time.perf_counter()
+            for axis, value in axes.items():
+                self._intents[(source, axis)] = Intent(source, value, priority, now + timeout, self._seq)
+            return self._resolve(now, source, axes)
+
+    def submit_frame(self, source: str, pose: tuple, **kw) -> Pose | None:
+        # A frame() or animation_pose() tuple as an intent on each axis it
+        # drives; None (an axis a Playback leaves alone) claims nothing.
+        axes = {a: v for a, v in zip(("servo1", "servo2", "servo3"), pose) if v is not None}
+        if len(pose) >= 5 and pose[3] is not None:
+            axes["claw_grabbing"] = tuple(pose[3:5]) == CLAW_GRAB
+        if not axes:
+            return None
+        return self.submit(source, **kw, **axes)
+
+    def release(self, source: str):
+        with self._lock:
+            for key in [k for k in self._intents if k[0] == source]:
+                del self._intents[key]
+
+    def stop(self, pose: tuple[int, int, int] | None = None, hold: float | None = None) -> Pose | None:
+        # Drop every intent and pin all axes where the arm is now (or at
+        # pose) until hold runs out; nothing else can move it meanwhile.
+        # hold <= 0 is a one-shot stop that pins nothing.
+        axes = dict(zip(("servo1", "servo2", "servo3"), pose or self.state.pose.servos))
+        axes["claw_grabbing"] = self.state.pose.claw_grabbing
+        if hold is None or hold > 0:
+            with self._lock:
+                self._intents.clear()
+            return self.submit("stop", timeout=hold, **axes)
+        with self._lock:
+            self._intents.clear()
+            self.submitted += 1
+            return self._publish("stop", axes)
+
+    def owners(self) -> dict:
+        now = time.perf_counter()
+        with self._lock:
+            return {axis: i.source for axis, i in self._winners(now).items()}
+
+    def _winners(self, now: float) -> dict:
+        for key in [k for k, i in self._intents.items() if i.expires <= now]:
+            del self._intents[key]
+        win: dict[str, Intent] = {}
+        for (_, axis), i in self._intents.items():
+            cur = win.get(axis)
+            if cur is None or (i.priority, i.seq) > (cur.priority, cur.seq):
+                win[axis] = i
+        return win
+
+    def _resolve(self, now: float, source: str, axes: dict) -> Pose | None:
+        win = self._winners(now)
+        changes = {axis: win[axis].value for axis in axes if axis in win and win[axis].source == source}
+        if len(changes) < len(axes):
+            self.overridden += 1
+        if not changes:
+            return None
+        return self._publish(source, changes)
+
+    def _publish(self, source: str, changes: dict) -> Pose:
+        old = self.state.pose
+        new = self.state.update(source, **changes)
+        if new[1:5] == old[1:5]:
+            return new
+        self.emitted += 1
+        record("pose", (new.version, *new.servos, new.claw_grabbing))
+        self._emit(new)
+        return new
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "emitted": self.emitted, "overridden": self.overridden}
+
+
+class CommandStream:
+    # The one serial path: arbiter -> trajectory streamer -> pose filter ->
+    # writer thread -> shared link.
+
+    def __init__(self):
+        from protocol import encode
+        from pose_filter import PoseFilter
+        from serial_link import get_link
+        from serial_writer import SerialWriter
+        from trajectory import TrajectoryStreamer
+
+        self.link = get_link()
+        self.writer = SerialWriter(
+            self.link, encode, PoseFilter(SEND_DEADBAND, MAX_SEND_HZ, state_axes=CLAW_AXES)
+        )
+        self.writer.start()
+        self.streamer = TrajectoryStreamer(
+            self.writer.submit,
+            frame(get_state().pose),
+            vmax=TRAJ_MAX_VEL,
+            amax=TRAJ_MAX_ACC,
+        )
+        self.streamer.start()
+        self.arbiter = Arbiter(get_state(), self._send)
+
+    def _send(self, pose: Pose):
+        if pose.source.split(":")[0] in DIRECT_SOURCES:
+            self.streamer.jump(frame(pose))
+            self.writer.submit(frame(pose))
+        else:
+            self.streamer.set_target(frame(pose))
+
+    def stop_motion(self, hold: float | None = None) -> Pose | None:
+        # Freeze at the interpolated position, not the last target.
+        return self.arbiter.stop(self.streamer.position[:3], hold)
+
+
+_stream: CommandStream | None = None
+_stream_lock = threading.Lock()
+
+
+def get_stream() -> CommandStream:
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = CommandStream()
+        return _stream
+
+
+def get_arbiter() -> Arbiter:
+    return get_stream().arbiter
+
+
+# SIMULATION
+def main():
+    ap = argparse.ArgumentParser("Run mouse, joystick, hand and voice intents together and count the merged stream")
+    ap.add_argument("--seconds", type=float, default=2.0)
+    args = ap.parse_args()
+
+    sent: list[tuple] = []
+    arb = Arbiter(RobotState(), lambda pose: sent.append(frame(pose)))
+    rates = {"mouse": 200, "joystick": 125, "hand": 30}
+    ticks = int(args.seconds * 1000)
+    submitted_naive = 0
+    for ms in range(ticks):
+        for src, hz in rates.items():
+            if ms % (1000 // hz) == 0:
+                v = 90 + (ms // 50) % 40
+                arb.submit(src, servo1=v, servo3=180 - v)
+                submitted_naive += 1
+        if ms % 500 == 0:
+            arb.submit("voice", claw_grabbing=(ms // 500) % 2 == 0)
+            submitted_naive += 1
+        if ms == ticks // 2:
+            arb.stop(hold=0.3)
+        time.sleep(0.001)
+
+    print(f"[Arbiter] {args.seconds:.0f}s with mouse/joystick/hand/voice running together")
+    print(f"  intents          {arb.submitted}")
+    print(f"  frames_emitted   {arb.emitted}  (naive: {submitted_naive}, one per intent)")
+    print(f"  overridden       {arb.overridden}")
+    print(f"  owners_at_end    {arb.owners()}")
+
+    # The claw flag has to reach servo2 on the wire, whoever sets it.
+    claw: list[tuple] = []
+    arb = Arbiter(RobotState(), lambda pose: claw.append(frame(pose)))
+    for src, grab in (("voice", True), ("voice", False), ("hand", True), ("claw", False)):
+        arb.submit(src, claw_grabbing=grab)
+        arb.release(src)
+    want = [CLAW_CLOSED_POS, CLAW_OPEN_POS, CLAW_CLOSED_POS, CLAW_OPEN_POS]
+    got = [f[1] for f in claw]
+    print(f"  claw_servo2      {got}  {'ok' if got == want else f'expected {want}'}")
+    return 0 if got == want else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
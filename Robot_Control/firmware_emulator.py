@@ -0,0 +1,302 @@
+from __future__ import annotations
+import argparse, os, select, struct, sys, threading, time, tty
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from protocol import BAUD_RATES, DEFAULT_BAUD, OP_ACK, OP_SET_BAUD, SYNC_V2, Decoder, Frame, crc8
+
+# Robot_Control.ino running on an Uno, as seen through a pty
+BITS_PER_BYTE = 10        # 8N1
+RX_BUFFER     = 64        # HardwareSerial's receive ring; bytes past it are lost
+BRIDGE_BUFFER = 1024      # USB-serial bridge; past it the host's writes block
+LOOP_BPS      = 400_000   # bytes/s loop() can parse; below the frame rate x 6 B it overflows
+SLEW_DPS      = 600.0     # hobby servo at no load, about 0.1 s / 60 deg
+HOME          = (90, 140, 90)
+TICK_S        = 0.001
+HISTORY_S     = 120.0
+
+PROTOCOLS = ("v2", "legacy")   # v2 = the sketch's v1/v2 parser, legacy = unsynced 5 x uint16
+LEGACY_FRAME = struct.Struct("<5H")
+
+
+class LegacyDecoder:
+    # The pre-sync format Hand_Tracker and voice_movement used to send:
+    # bare struct.pack("HHHHH") with no marker, so one lost byte shifts
+    # every later frame.
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.frames = 0
+        self.skipped = 0
+
+    def feed(self, data: bytes) -> list[Frame]:
+        self._buf += data
+        out = []
+        while len(self._buf) >= LEGACY_FRAME.size:
+            vals = LEGACY_FRAME.unpack_from(self._buf)
+            del self._buf[:LEGACY_FRAME.size]
+            if max(vals) > 180:
+                self.skipped += 1
+                continue
+            self.frames += 1
+            out.append(Frame(0, 0, vals))
+        return out
+
+
+class FirmwareEmulator:
+    # Opens a pty whose slave end behaves like the Arduino's port. Bytes
+    # cross the emulated UART at baud, land in a bounded RX buffer, are
+    # parsed at LOOP_BPS and drive three slew-limited servos. Targets and
+    # positions are sampled every tick for trajectory().
+
+    def __init__(
+        self,
+        baud: int = DEFAULT_BAUD,
+        protocol: str = "v2",
+        rx_buffer: int = RX_BUFFER,
+        loop_bps: float = LOOP_BPS,
+        slew_dps: float = SLEW_DPS,
+        tick: float = TICK_S,
+        history: float = HISTORY_S,
+    ):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"unknown protocol {protocol!r}, expected one of {PROTOCOLS}")
+        self.baud = baud
+        self.protocol = protocol
+        self.rx_buffer = rx_buffer
+        self.loop_bps = loop_bps
+        self.slew_dps = slew_dps
+        self.tick = tick
+        self.decoder = Decoder() if protocol == "v2" else LegacyDecoder()
+
+        self.master: int | None = None
+        self.slave: int | None = None
+        self.path: str | None = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self._wire: deque[tuple[float, int]] = deque()   # (host write time, byte)
+        self._rx: deque[tuple[float, int]] = deque()     # (time on the UART, byte)
+        self._wire_clock = 0.0
+        self._cpu_clock = 0.0
+        self._last_t: float | None = None
+
+        self.target = np.array(HOME, dtype=float)
+        self.position = np.array(HOME, dtype=float)
+        self.frames: deque[tuple[float, Frame]] = deque(maxlen=int(history / tick))
+        self._samples: deque[tuple] = deque(maxlen=int(history / tick))
+
+        self.bytes_in = 0
+        self.overflows = 0
+        self.baud_changes = 0
+
+    # LIFECYCLE
+    def start(self) -> str:
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="firmware-emulator", daemon=True)
+        self._thread.start()
+        return self.path
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = self.path = None
+
+    def _run(self):
+        while self._running:
+            if len(self._wire) < BRIDGE_BUFFER:
+                ready, _, _ = select.select([self.master], [], [], self.tick)
+                if ready:
+                    try:
+                        data = os.read(self.master, 4096)
+                    except OSError:
+                        data = b""
+                    now = time.perf_counter()
+                    self._wire.extend((now, b) for b in data)
+            else:
+                time.sleep(self.tick)
+            self.step(time.perf_counter())
+
+    # SIMULATION
+    def step(self, now: float):
+        with self._lock:
+            if self._last_t is None:
+                self._last_t = now
+            byte_s = BITS_PER_BYTE / self.baud
+            while self._wire:
+                t_host, b = self._wire[0]
+                done = max(self._wire_clock, t_host) + byte_s
+                if done > now:
+                    break
+                self._wire.popleft()
+                self._wire_clock = done
+                self._consume(done)
+                if len(self._rx) >= self.rx_buffer:
+                    self.overflows += 1
+                else:
+                    self._rx.append((done, b))
+                self.bytes_in += 1
+            self._consume(now)
+            self._slew(now)
+
+    def _consume(self, until: float):
+        # loop(): drain the RX buffer one byte at a time at loop_bps.
+        cost = 1.0 / self.loop_bps
+        while self._rx:
+            t_rx, b = self._rx[0]
+            t = max(self._cpu_clock, t_rx) + cost
+            if t > until:
+                return
+            self._rx.popleft()
+            self._cpu_clock = t
+            for frame in self.decoder.feed(bytes((b,))):
+                self._apply(t, frame)
+
+    def _apply(self, t: float, frame: Frame):
+        self.frames.append((t, frame))
+        if frame.version == 2 and not frame.angles:
+            if frame.op == OP_SET_BAUD and frame.arg < len(BAUD_RATES):
+                self._send_ack(frame.arg)
+                self.baud = BAUD_RATES[frame.arg]
+                self.baud_changes += 1
+            return
+        # Extra servos in a batched or legacy frame belong to older arms.
+        for i, a in enumerate(frame.angles[:3]):
+            self.target[i] = min(max(a, 0), 180)
+
+    def _send_ack(self, arg: int):
+        body = bytes((0, OP_ACK, arg))
+        try:
+            os.write(self.master, bytes((SYNC_V2, *body, crc8(body))))
+        except OSError:
+            pass
+
+    def _slew(self, now: float):
+        dt = now - self._last_t
+        self._last_t = now
+        step = self.slew_dps * dt
+        self.position += np.clip(self.target - self.position, -step, step)
+        self._samples.append((now, *self.target, *self.position))
+
+    # RESULTS
+    def trajectory(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (t, targets (n, 3), positions (n, 3)) sampled every tick
+        with self._lock:
+            data = np.array(self._samples, dtype=float).reshape(-1, 7)
+        return data[:, 0], data[:, 1:4], data[:, 4:7]
+
+    def stats(self) -> dict:
+        dec = self.decoder
+        return {
+            "bytes_in": self.bytes_in,
+            "frames": dec.frames,
+            "overflows": self.overflows,
+            "crc_errors": getattr(dec, "crc_errors", 0),
+            "skipped_bytes": dec.skipped,
+            "baud": self.baud,
+        }
+
+
+# BENCHMARK
+def _bench(emu: FirmwareEmulator, args) -> int:
+    from serial_link import SerialLink
+    from serial_writer import SerialWriter
+    from protocol import encode
+
+    if emu.protocol == "legacy":
+        enc = lambda pose: LEGACY_FRAME.pack(*pose)
+        poses = [(i % 181, 90, i // 181 % 181, 10, 170) for i in range(int(args.seconds * args.rate))]
+    else:
+        enc = encode
+        poses = [(i % 181, 90, i // 181 % 181) for i in range(int(args.seconds * args.rate))]
+
+    link = SerialLink(baud=args.baud, finder=lambda: emu.path, settle=0.0)
+    link.start()
+    if not link.wait_connected(2.0):
+        print("[Emulator] link did not connect", file=sys.stderr)
+        return 1
+    writer = SerialWriter(link, enc)
+    writer.start()
+
+    submitted: dict[tuple, float] = {}   # poses are distinct, so a parsed frame names its submit
+    period = 1 / args.rate
+    t_next = t0 = time.perf_counter()
+    for pose in poses:
+        submitted[pose[:3]] = time.perf_counter()
+        writer.submit(pose)
+        t_next += period
+        delay = t_next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    time.sleep(0.5)
+    writer.stop()
+    link.stop()
+    span = time.perf_counter() - t0
+
+    lat = sorted(t - submitted[f.angles[:3]] for t, f in list(emu.frames) if f.angles[:3] in submitted)
+    t, target, pos = emu.trajectory()
+    err = np.abs(target - pos).max(axis=1)
+    st = emu.stats()
+    print(f"[Emulator] {len(poses)} poses @ {args.rate:.0f} Hz, {emu.protocol} at {emu.baud} baud")
+    for k, v in st.items():
+        print(f"  {k:16} {v}")
+    print(f"  writer           sent {writer.sent}  coalesced {writer.dropped}")
+    print(f"  frames_per_s     {st['frames'] / span:.0f}")
+    if lat:
+        print(f"  submit_to_parse  p50 {1000 * lat[len(lat) // 2]:.2f}  p99 {1000 * lat[int(0.99 * (len(lat) - 1))]:.2f}  max {1000 * lat[-1]:.2f} ms")
+    print(f"  tracking_error   mean {err.mean():.1f}  max {err.max():.1f} deg over {len(t)} samples")
+    if args.save:
+        np.savez(args.save, t=t, target=target, position=pos)
+        print(f"  trajectory       saved to {args.save}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser("Emulate Robot_Control.ino on a pty")
+    ap.add_argument("--baud", type=int, default=DEFAULT_BAUD)
+    ap.add_argument("--protocol", choices=PROTOCOLS, default="v2")
+    ap.add_argument("--rx-buffer", type=int, default=RX_BUFFER)
+    ap.add_argument("--loop-bps", type=float, default=LOOP_BPS, help="bytes/s the sketch's loop() parses; --rate 2000 --loop-bps 5000 overflows RX")
+    ap.add_argument("--slew", type=float, default=SLEW_DPS, help="servo speed in deg/s")
+    ap.add_argument("--bench", action="store_true", help="drive the emulator through SerialWriter and report")
+    ap.add_argument("--rate", type=float, default=500.0, help="poses/s submitted in --bench")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--save", type=Path, help="write the joint trajectory to this .npz")
+    args = ap.parse_args()
+
+    emu = FirmwareEmulator(args.baud, args.protocol, args.rx_buffer, args.loop_bps, args.slew)
+    path = emu.start()
+    try:
+        if args.bench:
+            return _bench(emu, args)
+        from serial_link import PORT_ENV
+        print(f"[Emulator] {args.protocol} firmware at {args.baud} baud on {path}")
+        print(f"  export {PORT_ENV}={path}")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+        print(f"[Emulator] {emu.stats()}")
+        if args.save:
+            t, target, pos = emu.trajectory()
+            np.savez(args.save, t=t, target=target, position=pos)
+            print(f"  trajectory saved to {args.save}")
+        return 0
+    finally:
+        emu.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import argparse, sys, time
+from typing import NamedTuple
+
+import numpy as np
+
+# MediaPipe hand landmark indices
+WRIST = 0
+FINGER_PIPS = np.array([6, 10, 14, 18])   # index, middle, ring, pinky
+FINGER_TIPS = np.array([8, 12, 16, 20])
+MIDDLE_TIP = 12
+NUM_LANDMARKS = 21
+
+FIST_MIN_CURLED = 3
+OPEN_MIN_SPREAD = 0.3
+
+
+class HandFeatures(NamedTuple):
+    # Every field has the leading shape of the input: scalars for a single
+    # (21, 3) hand, arrays of length T for a (T, 21, 3) sequence.
+    curled: np.ndarray       # fingers whose tip is below its PIP joint
+    spread: np.ndarray       # mean wrist-to-fingertip distance (image plane)
+    fist: np.ndarray
+    open: np.ndarray
+    angle: np.ndarray        # wrist -> middle tip, degrees
+    wrist: np.ndarray        # (..., 2) normalized x, y
+    middle_tip: np.ndarray   # (..., 2)
+
+
+def landmarks_to_array(landmarks, out: np.ndarray | None = None) -> np.ndarray:
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    for i, lm in enumerate(landmarks):
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.z
+    return out
+
+
+def extract_features(points: np.ndarray) -> HandFeatures:
+    pts = np.asarray(points, dtype=np.float32)
+    wrist = pts[..., WRIST, :2]
+    tips = pts[..., FINGER_TIPS, :2]
+
+    curled = (pts[..., FINGER_TIPS, 1] > pts[..., FINGER_PIPS, 1]).sum(axis=-1)
+    spread = np.linalg.norm(tips - wrist[..., None, :], axis=-1).mean(axis=-1)
+
+    middle = pts[..., MIDDLE_TIP, :2]
+    d = middle - wrist
+    angle = np.degrees(np.arctan2(d[..., 1], d[..., 0]))
+
+    return HandFeatures(
+        curled=curled,
+        spread=spread,
+        fist=curled >= FIST_MIN_CURLED,
+        open=spread > OPEN_MIN_SPREAD,
+        angle=angle,
+        wrist=wrist,
+        middle_tip=middle,
+    )
+
+
+def load_sequence(path: str) -> tuple[np.ndarray, np.ndarray]:
+    # .npz written by Hand_Tracker --save-landmarks: points (T, 21, 3) and t (T,)
+    data = np.load(path)
+    return data["points"], data["t"]
+
+
+def main():
+    ap = argparse.ArgumentParser("Extract gesture features from a recorded landmark sequence")
+    ap.add_argument("trace", help=".npz from Hand_Tracker --save-landmarks")
+    args = ap.parse_args()
+
+    points, t = load_sequence(args.trace)
+    t0 = time.perf_counter()
+    f = extract_features(points)
+    dt = time.perf_counter() - t0
+
+    print(f"[Features] {len(points)} frames over {t[-1] - t[0]:.1f}s in {1000 * dt:.2f} ms")
+    print(f"  fist_frames      {int(f.fist.sum())}")
+    print(f"  open_frames      {int(f.open.sum())}")
+    print(f"  spread           min {f.spread.min():.3f}  median {np.median(f.spread):.3f}  max {f.spread.max():.3f}")
+    print(f"  angle            min {f.angle.min():.1f}  max {f.angle.max():.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
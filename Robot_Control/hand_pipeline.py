@@ -0,0 +1,302 @@
+from __future__ import annotations
+import threading, time
+from collections import deque
+from typing import Any, Callable
+
+import cv2
+import numpy as np
+
+from hand_roi import AdaptiveScaler, RoiTracker
+
+
+class LatestQueue:
+    # Single-slot queue where a newer item replaces one nobody picked up yet,
+    # so the consumer always gets the freshest frame.
+
+    def __init__(self, on_drop: Callable[[Any], None] | None = None):
+        self._cond = threading.Condition()
+        self._item: Any = None
+        self._closed = False
+        self._on_drop = on_drop
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            stale, self._item = self._item, item
+            self._cond.notify()
+        if stale is not None:
+            self.dropped += 1
+            if self._on_drop:
+                self._on_drop(stale)
+
+    def get(self, timeout: float | None = None):
+        with self._cond:
+            if self._item is None and not self._closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def drained(self) -> bool:
+        return self._closed and self._item is None
+
+
+class FramePool:
+    # Recycles frame-sized buffers between capture and inference so the
+    # flip and colour conversion can write through dst= instead of
+    # allocating every frame.
+
+    def __init__(self, size: int = 3):
+        self._free: list[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.size = size
+        self.allocated = 0
+
+    def acquire(self, like: np.ndarray) -> np.ndarray:
+        with self._lock:
+            while self._free:
+                buf = self._free.pop()
+                if buf.shape == like.shape:
+                    return buf
+        self.allocated += 1
+        return np.empty_like(like)
+
+    def release(self, buf: np.ndarray | None):
+        if buf is None:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buf)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self._t0: float | None = None
+        self._t_last = 0.0
+
+    def record(self, started: float):
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = started
+        self._t_last = now
+        self.busy += now - started
+        self.frames += 1
+
+    @property
+    def fps(self) -> float:
+        if self._t0 is None or self._t_last <= self._t0:
+            return 0.0
+        return self.frames / (self._t_last - self._t0)
+
+
+class Frame:
+    __slots__ = ("idx", "t_capture", "image", "shape", "results", "overlay", "t_command")
+
+    def __init__(self, idx: int, t_capture: float, image):
+        self.idx = idx
+        self.t_capture = t_capture
+        self.image = image
+        self.shape = image.shape
+        self.results = None
+        self.overlay = None
+        self.t_command: float | None = None
+
+
+class HandPipeline:
+    # capture -> inference (+ servo command) -> render, one thread each,
+    # linked by LatestQueues. Commands go out from the inference thread so a
+    # slow display never holds back the arm; render runs on the caller's
+    # thread because cv2.imshow wants it there.
+    #
+    # Headless drops the render stage entirely (inference runs on the
+    # caller's thread) and recycles the capture buffers through a FramePool.
+
+    def __init__(
+        self,
+        source,
+        hands,
+        on_result: Callable[[Frame], None],
+        draw: Callable[[Frame], None],
+        display: bool = True,
+        realtime: bool = False,
+        headless: bool = False,
+        roi: RoiTracker | None = None,
+        scaler: AdaptiveScaler | None = None,
+        history: int = 1000,
+    ):
+        self.source = source
+        self.hands = hands
+        self.on_result = on_result
+        self.draw = draw
+        self.headless = headless
+        self.display = display and not headless
+        self.realtime = realtime
+        self.roi = roi
+        self.scaler = scaler
+
+        self.cap: cv2.VideoCapture | None = None
+        self.stop_evt = threading.Event()
+        self.pool = FramePool() if headless else None
+        self.to_infer = LatestQueue(self._recycle)
+        self.to_render = LatestQueue()
+        self.stats = {n: StageStats(n) for n in ("capture", "inference", "render")}
+        self.latencies: deque[float] = deque(maxlen=history)
+        self._threads: list[threading.Thread] = []
+
+    def stop(self):
+        self.stop_evt.set()
+        self.to_infer.close()
+        self.to_render.close()
+
+    def _recycle(self, frame: Frame):
+        if self.pool is not None:
+            self.pool.release(frame.image)
+            frame.image = None
+
+    # STAGES
+    def _capture(self):
+        st = self.stats["capture"]
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        period = 1 / fps if self.realtime else 0.0
+        next_t = time.perf_counter()
+        idx = 0
+        raw = small = None
+        while not self.stop_evt.is_set():
+            t0 = time.perf_counter()
+            ret, raw = self.cap.read(raw) if self.pool is not None else self.cap.read()
+            if not ret:
+                raw = None
+                if isinstance(self.source, int):
+                    print("Error: Could not read frame from webcam.")
+                    continue
+                break  # end of recording: let the later stages drain
+            src = raw
+            scale = self.scaler.scale if self.scaler else 1.0
+            if scale < 1.0:
+                size = (int(raw.shape[1] * scale), int(raw.shape[0] * scale))
+                if small is None or small.shape[1::-1] != size:
+                    small = None
+                src = small = cv2.resize(raw, size, dst=small, interpolation=cv2.INTER_AREA)
+            if self.pool is not None:
+                image = cv2.flip(src, 1, dst=self.pool.acquire(src))
+            else:
+                image = cv2.flip(src, 1)
+            st.record(t0)
+            self.to_infer.put(Frame(idx, t0, image))
+            idx += 1
+            if period:
+                next_t += period
+                delay = next_t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.to_infer.close()
+
+    def _inference(self):
+        st = self.stats["inference"]
+        rgb = crop_rgb = None
+        while not self.stop_evt.is_set():
+            frame = self.to_infer.get(timeout=0.1)
+            if frame is None:
+                if self.to_infer.drained:
+                    break
+                continue
+            t0 = time.perf_counter()
+            region = self.roi.region(frame.shape) if self.roi else None
+            if region is not None:
+                x0, y0, x1, y1 = region
+                crop = frame.image[y0:y1, x0:x1]
+                # The box moves with the hand, so only its size has to match.
+                if crop_rgb is None or crop_rgb.shape != crop.shape:
+                    crop_rgb = np.empty_like(crop)
+                image_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=crop_rgb)
+                if self.headless:
+                    self._recycle(frame)
+            elif self.headless:
+                if rgb is None or rgb.shape != frame.image.shape:
+                    rgb = np.empty_like(frame.image)
+                image_rgb = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB, dst=rgb)
+                self._recycle(frame)
+            else:
+                # Drawing goes on the flipped BGR frame, no round trip needed.
+                image_rgb = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)
+            frame.results = self.hands.process(image_rgb)
+            if self.roi:
+                self.roi.update(frame.results, region, frame.shape)
+            if self.scaler:
+                self.scaler.tick()
+            self.on_result(frame)
+            if frame.t_command is not None:
+                self.latencies.append(frame.t_command - frame.t_capture)
+            st.record(t0)
+            if not self.headless:
+                self.to_render.put(frame)
+        self.to_render.close()
+
+    def _render(self):
+        st = self.stats["render"]
+        while not self.stop_evt.is_set():
+            frame = self.to_render.get(timeout=0.1)
+            if frame is None:
+                if self.to_render.drained:
+                    break
+                continue
+            t0 = time.perf_counter()
+            self.draw(frame)
+            if self.display:
+                cv2.imshow('Hand Tracker', frame.image)
+                if cv2.waitKey(1) & 0xFF == 27:
+                    self.stop()
+            st.record(t0)
+
+    def run(self) -> bool:
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        self._threads = [threading.Thread(target=self._capture, name="hand-capture", daemon=True)]
+        if not self.headless:
+            self._threads.append(
+                threading.Thread(target=self._inference, name="hand-inference", daemon=True)
+            )
+        for t in self._threads:
+            t.start()
+        try:
+            if self.headless:
+                self._inference()
+            else:
+                self._render()
+        finally:
+            self.stop()
+            for t in self._threads:
+                t.join(1.0)
+            self.cap.release()
+            self.cap = None
+            if self.display:
+                cv2.destroyAllWindows()
+        return True
+
+    def report(self) -> dict:
+        lat = sorted(self.latencies)
+        out = {}
+        for name, st in self.stats.items():
+            out[f"{name}_fps"] = st.fps
+            out[f"{name}_ms"] = 1000 * st.busy / st.frames if st.frames else 0.0
+        out["dropped_before_inference"] = self.to_infer.dropped
+        out["dropped_before_render"] = self.to_render.dropped
+        out["buffers_allocated"] = self.pool.allocated if self.pool else 0
+        if self.roi:
+            out["roi_crops"] = self.roi.crops
+            out["roi_full_searches"] = self.roi.full_searches
+        if self.scaler:
+            out["input_scale"] = self.scaler.scale
+            out["scale_changes"] = self.scaler.changes
+        out["latency_mean_ms"] = 1000 * sum(lat) / len(lat) if lat else 0.0
+        out["latency_p95_ms"] = 1000 * lat[int(0.95 * (len(lat) - 1))] if lat else 0.0
+        return out
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import time
+
+
+class RoiTracker:
+    # Runs inference on a square crop around where the hand was last seen
+    # and falls back to the full frame as soon as the hand is lost.
+    # Landmarks found in the crop are remapped in place to full-frame
+    # normalized coordinates, so downstream code never sees the crop.
+    # The box is kept normalized too, so it still lands on the hand when
+    # AdaptiveScaler changes the frame size between two frames.
+    # Pair it with a Hands in static_image_mode: MediaPipe's own tracking
+    # assumes consecutive full frames and loses the hand when the crop jumps.
+
+    def __init__(self, expand: float = 1.8, min_size: float = 0.3):
+        self.expand = expand
+        self.min_size = min_size
+        self.box: tuple[float, float, float, float] | None = None   # x0, y0, x1, y1 in 0..1
+        self.crops = 0
+        self.full_searches = 0
+
+    def region(self, shape) -> tuple[int, int, int, int] | None:
+        # The box in pixels of a frame with this shape, or None for a full search.
+        if self.box is not None:
+            height, width = shape[:2]
+            nx0, ny0, nx1, ny1 = self.box
+            x0, y0 = int(nx0 * width), int(ny0 * height)
+            x1, y1 = min(round(nx1 * width), width), min(round(ny1 * height), height)
+            if x1 > x0 and y1 > y0:
+                self.crops += 1
+                return x0, y0, x1, y1
+        self.full_searches += 1
+        return None
+
+    def update(self, results, region, shape):
+        height, width = shape[:2]
+        if not results.multi_hand_landmarks:
+            self.box = None
+            return
+
+        if region is not None:
+            # region came from region(shape), so it is the crop that was inferred on
+            x0, y0, x1, y1 = region
+            cw, ch = min(x1, width) - x0, min(y1, height) - y0
+            for hand in results.multi_hand_landmarks:
+                for lm in hand.landmark:
+                    lm.x = (x0 + lm.x * cw) / width
+                    lm.y = (y0 + lm.y * ch) / height
+                    lm.z = lm.z * cw / width
+
+        pts = results.multi_hand_landmarks[0].landmark
+        xs = [lm.x * width for lm in pts]
+        ys = [lm.y * height for lm in pts]
+        cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        size = max(max(xs) - min(xs), max(ys) - min(ys)) * self.expand
+        size = min(max(size, self.min_size * min(width, height)), min(width, height))
+        half = size / 2
+        x0 = min(max(cx - half, 0), width - size)
+        y0 = min(max(cy - half, 0), height - size)
+        self.box = (x0 / width, y0 / height, (x0 + size) / width, (y0 + size) / height)
+
+
+class AdaptiveScaler:
+    # Shrinks the frames fed to inference when the loop falls behind
+    # target_fps and grows them back once there is headroom again.
+
+    def __init__(
+        self,
+        target_fps: float = 20.0,
+        min_scale: float = 0.4,
+        step: float = 0.1,
+        window: float = 1.0,
+    ):
+        self.target_fps = target_fps
+        self.min_scale = min_scale
+        self.step = step
+        self.window = window
+        self.scale = 1.0
+        self.changes = 0
+        self._frames = 0
+        self._t0 = time.perf_counter()
+
+    def tick(self) -> float:
+        self._frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._t0
+        if elapsed < self.window:
+            return self.scale
+        fps = self._frames / elapsed
+        self._frames, self._t0 = 0, now
+
+        if fps < self.target_fps and self.scale > self.min_scale:
+            self.scale = max(self.min_scale, round(self.scale - self.step, 2))
+            self.changes += 1
+        elif fps > self.target_fps * 1.5 and self.scale < 1.0:
+            self.scale = min(1.0, round(self.scale + self.step, 2))
+            self.changes += 1
+        return self.scale
@@ -0,0 +1,151 @@
+from __future__ import annotations
+import argparse, sys
+from typing import Sequence
+
+import numpy as np
+
+from hand_features import FIST_MIN_CURLED, OPEN_MIN_SPREAD, extract_features, load_sequence
+
+# One-Euro defaults per axis (x, y, z); z is the noisiest and least used
+MIN_CUTOFF = (1.5, 1.5, 0.5)   # Hz
+BETA       = (5.0, 5.0, 0.0)    # normalized units are ~0.1-2 per second
+D_CUTOFF   = 1.0
+
+
+def _alpha(cutoff, dt: float):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    # One-Euro filter over a whole (21, 3) landmark array at once, with
+    # per-axis min_cutoff/beta. Slow motion gets heavy smoothing, fast
+    # motion raises the cutoff so lag stays low.
+
+    def __init__(
+        self,
+        min_cutoff: float | Sequence[float] = MIN_CUTOFF,
+        beta: float | Sequence[float] = BETA,
+        d_cutoff: float = D_CUTOFF,
+    ):
+        self.min_cutoff = np.asarray(min_cutoff, dtype=np.float32)
+        self.beta = np.asarray(beta, dtype=np.float32)
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x: np.ndarray | None = None
+        self._dx: np.ndarray | None = None
+        self._t = 0.0
+
+    def __call__(self, x: np.ndarray, t: float) -> np.ndarray:
+        if self._x is None:
+            self._x = x.astype(np.float32, copy=True)
+            self._dx = np.zeros_like(self._x)
+            self._t = t
+            return self._x.copy()
+
+        dt = t - self._t
+        if dt <= 0:
+            return self._x.copy()
+        self._t = t
+
+        dx = (x - self._x) / dt
+        self._dx += _alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(self._dx)
+        self._x += _alpha(cutoff, dt) * (x - self._x)
+        return self._x.copy()
+
+
+class ClawHysteresis:
+    # Fist/open decisions with separate enter/exit thresholds plus a short
+    # hold, so a hand hovering on a threshold does not toggle the claw.
+
+    def __init__(
+        self,
+        grab_curled: int = FIST_MIN_CURLED,
+        release_spread: float = OPEN_MIN_SPREAD,
+        spread_margin: float = 0.03,
+        hold_frames: int = 3,
+        grabbing: bool = True,
+    ):
+        self.grab_curled = grab_curled
+        self.release_spread = release_spread + spread_margin
+        self.grab_spread = release_spread - spread_margin
+        self.hold_frames = hold_frames
+        self.grabbing = grabbing
+        self._streak = 0
+
+    def update(self, curled: int, spread: float) -> bool:
+        if self.grabbing:
+            flip = spread > self.release_spread and curled < self.grab_curled
+        else:
+            flip = curled >= self.grab_curled and spread < self.grab_spread
+        self._streak = self._streak + 1 if flip else 0
+        if self._streak >= self.hold_frames:
+            self.grabbing = not self.grabbing
+            self._streak = 0
+        return self.grabbing
+
+
+# OFFLINE EVALUATION
+def map_servos(points: np.ndarray) -> np.ndarray:
+    # Same mapping as Hand_Tracker (dial relative to the first frame).
+    f = extract_features(points)
+    dial = (f.angle - f.angle[0] + 180) % 360 - 180
+    return np.stack([
+        (dial + 180) * 180 / 360,
+        10 + f.wrist[:, 1] * 160,
+        170 - f.middle_tip[:, 0] * 160,
+    ], axis=1)
+
+
+def smooth_sequence(points: np.ndarray, t: np.ndarray, filt: OneEuroFilter) -> np.ndarray:
+    filt.reset()
+    return np.stack([filt(p, ti) for p, ti in zip(points, t)])
+
+
+def evaluate(points: np.ndarray, t: np.ndarray, filt: OneEuroFilter | None) -> dict:
+    if filt is not None:
+        points = smooth_sequence(points, t, filt)
+    servos = map_servos(points)
+    ints = np.rint(servos).astype(int)
+    steps = np.diff(servos, axis=0)
+    jitter = np.sqrt(np.mean(np.diff(steps, axis=0) ** 2))
+    commands = int(np.any(ints[1:] != ints[:-1], axis=1).sum())
+    return {"jitter": jitter, "commands": commands, "servos": servos}
+
+
+def lag_frames(ref: np.ndarray, sig: np.ndarray, max_lag: int = 30) -> int:
+    # Shift (in frames) that best aligns sig with ref, per cross-correlation.
+    ref = ref - ref.mean()
+    sig = sig - sig.mean()
+    best, best_lag = -np.inf, 0
+    for lag in range(max_lag + 1):
+        c = np.dot(ref[:len(ref) - lag], sig[lag:])
+        if c > best:
+            best, best_lag = c, lag
+    return best_lag
+
+
+def main():
+    ap = argparse.ArgumentParser("Replay a landmark trace and report jitter vs lag for the smoother")
+    ap.add_argument("trace", help=".npz from Hand_Tracker --save-landmarks")
+    ap.add_argument("--min-cutoff", type=float, nargs=3, default=MIN_CUTOFF)
+    ap.add_argument("--beta", type=float, nargs=3, default=BETA)
+    args = ap.parse_args()
+
+    points, t = load_sequence(args.trace)
+    raw = evaluate(points, t, None)
+    smooth = evaluate(points, t, OneEuroFilter(args.min_cutoff, args.beta))
+    frame_ms = 1000 * float(np.median(np.diff(t)))
+    lags = [lag_frames(raw["servos"][:, i], smooth["servos"][:, i]) for i in range(3)]
+
+    print(f"[Smoothing] {len(points)} frames, min_cutoff {args.min_cutoff}, beta {args.beta}")
+    print(f"  jitter_deg       raw {raw['jitter']:.3f}  smoothed {smooth['jitter']:.3f}")
+    print(f"  commands         raw {raw['commands']}  smoothed {smooth['commands']}")
+    print(f"  lag              {max(lags)} frames (~{max(lags) * frame_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,382 @@
-import hid
+from __future__ import annotations
+import argparse, json, os, sys, threading, time
+from pathlib import Path
+from typing import Callable, NamedTuple, Sequence
 
+from recorder import record
+
+try:
+    import hid
+except ImportError:   # replay and benchmarks work without hidapi
+    hid = None
+
+# Logitech Extreme 3D Pro
 VID = 0x046D
 PID = 0xC215
 
+AXIS_MAX     = 1023   # X / Y are 10-bit
+HAT_CENTER   = 8      # hat reads 0-7 clockwise from north, 8 when released
+READ_TIMEOUT_MS = 50  # bounds how long stop() waits on a quiet stick
+MIN_BACKOFF  = 0.25
+MAX_BACKOFF  = 4.0
+
+# JOYSTICK_DEBUG=1 prints every raw report; off, the read loop does no I/O
+DEBUG = bool(os.environ.get("JOYSTICK_DEBUG"))
+
+
+def _debug(*args):
+    if DEBUG:
+        print("[Joystick]", *args, file=sys.stderr)
+
+
+class JoystickReport(NamedTuple):
+    x: int          # 0-1023, left to right
+    y: int          # 0-1023, forward to back
+    hat: int        # 0-7, HAT_CENTER when released
+    twist: int      # 0-255
+    throttle: int   # 0-255, 0 at the + end
+    buttons: int    # bit n-1 set while button n (1-12) is held
+
+    def pressed(self, n: int) -> bool:
+        return bool(self.buttons >> (n - 1) & 1)
+
+
+def decode_report(data: Sequence[int]) -> JoystickReport:
+    # 0xC215 input report (7 bytes):
+    #   bytes 0-3  little-endian: X bits 0-9, Y bits 10-19, hat bits 20-23, twist bits 24-31
+    #   byte 4     buttons 1-8
+    #   byte 5     throttle
+    #   byte 6     buttons 9-12 in the low nibble
+    if len(data) < 7:
+        raise ValueError(f"short joystick report ({len(data)} bytes)")
+    word = data[0] | data[1] << 8 | data[2] << 16 | data[3] << 24
+    return JoystickReport(
+        x=word & 0x3FF,
+        y=word >> 10 & 0x3FF,
+        hat=word >> 20 & 0xF,
+        twist=data[3],
+        throttle=data[5],
+        buttons=data[4] | (data[6] & 0x0F) << 8,
+    )
+
+
+def encode_report(r: JoystickReport) -> list[int]:
+    # Inverse of decode_report, for synthetic captures.
+    word = (r.x & 0x3FF) | (r.y & 0x3FF) << 10 | (r.hat & 0xF) << 20 | (r.twist & 0xFF) << 24
+    return [word & 0xFF, word >> 8 & 0xFF, word >> 16 & 0xFF, word >> 24 & 0xFF,
+            r.buttons & 0xFF, r.throttle & 0xFF, r.buttons >> 8 & 0x0F]
+
+
+# DISCOVERY
+_paths: dict[tuple[int, int], bytes] = {}
+_paths_lock = threading.Lock()
+
+
 def list_hid_devices():
     print("Listing all HID devices:")
     for device in hid.enumerate():
         print(f"VID: {hex(device['vendor_id'])}, PID: {hex(device['product_id'])}, Product: {device['product_string']}")
 
-def read_joystick_data():
-    print(f"\nConnecting to device: VID={hex(VID)}, PID={hex(PID)}")
-    try:
-        joystick = hid.device()
-        joystick.open(VID, PID)
-        print(f"Connected to {joystick.get_product_string()}")
 
-        print("Listening for joystick input... Move the stick or press buttons. (Ctrl+C to exit)\n")
-        while True:
-            data = joystick.read(64)
+def find_device(vid: int = VID, pid: int = PID, refresh: bool = False) -> bytes | None:
+    # HID path for vid/pid. Enumerating the bus is slow, so the path is
+    # cached and only looked up again on a miss or after a failed open.
+    key = (vid, pid)
+    with _paths_lock:
+        if not refresh and key in _paths:
+            return _paths[key]
+    if hid is None:
+        return None
+    path = next((d["path"] for d in hid.enumerate(vid, pid)), None)
+    with _paths_lock:
+        if path is None:
+            _paths.pop(key, None)
+        else:
+            _paths[key] = path
+    return path
+
+
+def forget_device(vid: int = VID, pid: int = PID):
+    with _paths_lock:
+        _paths.pop((vid, pid), None)
+
+
+def open_device(vid: int = VID, pid: int = PID):
+    refresh = False
+    for _ in range(2):
+        path = find_device(vid, pid, refresh)
+        if path is None:
+            return None
+        dev = hid.device()
+        try:
+            # More reliable on macOS than open(VID, PID)
+            dev.open_path(path)
+            return dev
+        except OSError:
+            refresh = True   # stale cached path, e.g. replugged into another port
+    forget_device(vid, pid)
+    return None
+
+
+class FakeHidDevice:
+    # Stands in for hid.device: replays captured reports at rate_hz and
+    # records when each one became readable, for latency measurements.
+    # unplug_after makes read() fail like a pulled cable after that many.
+
+    def __init__(self, reports: Sequence[Sequence[int]], rate_hz: float = 500.0,
+                 loop: bool = False, unplug_after: int | None = None):
+        self.reports = [list(r) for r in reports]
+        self.period = 1.0 / rate_hz
+        self.loop = loop
+        self.unplug_after = unplug_after
+        self.sent_at: list[float] = []
+        self._t0: float | None = None
+        self._i = 0
+        self.closed = False
+
+    def open_path(self, path):
+        self._t0 = time.perf_counter()
+
+    def get_product_string(self) -> str:
+        return "Fake Extreme 3D"
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.loop and self._i >= len(self.reports)
+
+    def read(self, size: int, timeout_ms: int = 0) -> list[int]:
+        if self.closed or (self.unplug_after is not None and self._i >= self.unplug_after):
+            raise OSError("read error (device disconnected)")
+        if self.exhausted:
+            time.sleep(timeout_ms / 1000)
+            return []
+        due = self._t0 + self._i * self.period
+        wait = due - time.perf_counter()
+        if wait > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        report = self.reports[self._i % len(self.reports)]
+        self._i += 1
+        self.sent_at.append(max(due, self._t0))
+        return report[:size]
+
+    def close(self):
+        self.closed = True
+
+
+class JoystickReader:
+    # Reads the stick on its own thread and calls on_report with each
+    # decoded report that differs from the last one. If the stick is
+    # missing or unplugged, it keeps retrying with backoff and re-attaches
+    # when it comes back.
+
+    def __init__(
+        self,
+        on_report: Callable[[JoystickReport], None],
+        vid: int = VID,
+        pid: int = PID,
+        opener: Callable[[], object | None] | None = None,
+        on_status: Callable[[bool], None] | None = None,
+    ):
+        self.vid, self.pid = vid, pid
+        self._on_report = on_report
+        self._opener = opener or (lambda: open_device(vid, pid))
+        self._on_status = on_status
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.attached = False
+        self.reports = 0
+        self.duplicates = 0
+        self.attaches = 0
+        self.detaches = 0
+        self.bad_reports = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="joystick", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _set_attached(self, up: bool):
+        self.attached = up
+        if self._on_status:
+            self._on_status(up)
+
+    def _run(self):
+        backoff = MIN_BACKOFF
+        waiting_logged = False
+        while not self._stop.is_set():
+            dev = self._opener()
+            if dev is None:
+                if not waiting_logged:
+                    print(f"[Joystick] waiting for {self.vid:04x}:{self.pid:04x}...")
+                    waiting_logged = True
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = MIN_BACKOFF
+            waiting_logged = False
+            self.attaches += 1
+            print(f"[Joystick] connected: {dev.get_product_string()}")
+            self._set_attached(True)
+            try:
+                self._read_loop(dev)
+            except (OSError, ValueError) as e:   # hidapi's errors for a pulled or closed device
+                self.detaches += 1
+                print(f"[Joystick] disconnected: {e}")
+                forget_device(self.vid, self.pid)
+            finally:
+                try:
+                    dev.close()
+                except Exception:
+                    pass
+                self._set_attached(False)
+
+    def _read_loop(self, dev):
+        last = None
+        while not self._stop.is_set():
+            data = dev.read(64, READ_TIMEOUT_MS)
+            if not data:
+                continue
+            _debug("raw", data)
+            if data == last:
+                self.duplicates += 1
+                continue
+            last = data
+            try:
+                report = decode_report(data)
+            except ValueError:
+                self.bad_reports += 1
+                continue
+            self.reports += 1
+            record("joystick", report)
+            self._on_report(report)
+
+    def stats(self) -> dict:
+        return {
+            "reports": self.reports,
+            "duplicates": self.duplicates,
+            "bad_reports": self.bad_reports,
+            "attaches": self.attaches,
+            "detaches": self.detaches,
+        }
+
+
+# CAPTURE / BENCHMARK
+def synthetic_reports(n: int) -> list[list[int]]:
+    # A stick sweep with the trigger pulsing, shaped like a real capture.
+    out = []
+    for i in range(n):
+        phase = i / max(1, n - 1)
+        out.append(encode_report(JoystickReport(
+            x=int(AXIS_MAX * phase),
+            y=int(AXIS_MAX * (1 - phase)),
+            hat=HAT_CENTER,
+            twist=128,
+            throttle=255 - int(255 * phase),
+            buttons=1 if (i // 50) % 2 else 0,
+        )))
+    return out
+
+
+def load_capture(path: Path) -> list[list[int]]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def capture(path: Path, seconds: float):
+    dev = open_device()
+    if dev is None:
+        print(f"[Joystick] {VID:04x}:{PID:04x} not found", file=sys.stderr)
+        return 1
+    n = 0
+    end = time.perf_counter() + seconds
+    with path.open("w") as f:
+        while time.perf_counter() < end:
+            data = dev.read(64, READ_TIMEOUT_MS)
             if data:
-                print(f"Raw Data: {data}")
-    except KeyboardInterrupt:
-        print("\nExiting...")
-    except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        joystick.close()
-        print("Joystick connection closed.")
+                f.write(json.dumps(data) + "\n")
+                n += 1
+    dev.close()
+    print(f"[Joystick] captured {n} reports to {path}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser("Replay joystick reports through the reader into the arbiter and time them")
+    ap.add_argument("--list", action="store_true", help="list HID devices and exit")
+    ap.add_argument("--capture", type=Path, help="record the real stick's reports to this JSONL file")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--replay", type=Path, help="JSONL capture to replay (default: synthetic sweep)")
+    ap.add_argument("--reports", type=int, default=2000)
+    ap.add_argument("--rate-hz", type=float, default=1000.0)
+    ap.add_argument("--unplug", action="store_true", help="pull the fake stick halfway and re-attach")
+    args = ap.parse_args()
+
+    if args.list:
+        list_hid_devices()
+        return 0
+    if args.capture:
+        return capture(args.capture, args.seconds)
+
+    from arbiter import Arbiter
+    from robot_state import RobotState
+
+    reports = load_capture(args.replay) if args.replay else synthetic_reports(args.reports)
+    devices = [FakeHidDevice(reports, args.rate_hz, unplug_after=len(reports) // 2 if args.unplug else None)]
+    if args.unplug:
+        devices.append(FakeHidDevice(reports[len(reports) // 2:], args.rate_hz))
+
+    def opener():
+        if not devices:
+            return None
+        dev = devices.pop(0)
+        dev.open_path(b"fake")
+        opened.append(dev)
+        return dev
+
+    opened: list[FakeHidDevice] = []
+    lat: list[float] = []
+    arb = Arbiter(RobotState(), lambda pose: None)
+
+    def on_report(r: JoystickReport):
+        arb.submit(
+            "joystick",
+            servo1=10 + r.x * 160 // AXIS_MAX,
+            servo3=10 + r.y * 160 // AXIS_MAX,
+        )
+        lat.append(time.perf_counter() - opened[-1].sent_at[-1])
+
+    reader = JoystickReader(on_report, opener=opener)
+    t0 = time.perf_counter()
+    reader.start()
+    while not (opened and opened[-1].exhausted and not devices) and time.perf_counter() - t0 < 60:
+        time.sleep(0.01)
+    reader.stop()
+    span = time.perf_counter() - t0
+
+    sent = [t for dev in opened for t in dev.sent_at]
+    lat.sort()
+    print(f"[Joystick] {len(sent)} reports replayed at {args.rate_hz:.0f} Hz in {span:.2f}s")
+    print(f"  reader           {reader.stats()}")
+    print(f"  throughput       {len(lat) / span:,.0f} reports/s into the arbiter")
+    if lat:
+        print(f"  report_to_servo  p50 {1e6 * lat[len(lat) // 2]:.0f} us  p99 {1e6 * lat[int(0.99 * (len(lat) - 1))]:.0f} us"
+              f"  max {1e6 * lat[-1]:.0f} us")
+    return 0
+
 
 if __name__ == "__main__":
-    list_hid_devices()
-    read_joystick_data()
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from pathlib import Path
+
+from vosk import KaldiRecognizer, Model
+
+SAMPLE_RATE = 16_000
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_MODEL = HERE / "models" / "vosk-model-small-en-us-0.15"
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class _Entry:
+    def __init__(self, path: Path):
+        self.path = path
+        self.ready = threading.Event()
+        self.model: Model | None = None
+        self.error: Exception | None = None
+        self.load_s = 0.0
+        self.rss_mb = 0.0
+
+    def load(self):
+        print(f"[Vosk] loading {self.path.name}…", file=sys.stderr)
+        rss0, t0 = rss_mb(), time.perf_counter()
+        try:
+            self.model = Model(str(self.path))
+        except Exception as e:
+            self.error = e
+        self.load_s = time.perf_counter() - t0
+        self.rss_mb = rss_mb() - rss0
+        if self.error is None:
+            print(f"[Vosk] {self.path.name} ready in {self.load_s:.2f}s (+{self.rss_mb:.0f} MB RSS)",
+                  file=sys.stderr)
+        self.ready.set()
+
+
+# One Model per directory for the whole process; recognizers are cheap and
+# are created per session on top of the shared model.
+_entries: dict[Path, _Entry] = {}
+_lock = threading.Lock()
+
+
+def _entry(path) -> tuple[_Entry, bool]:
+    key = Path(path).resolve()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            return entry, False
+        entry = _entries[key] = _Entry(key)
+    return entry, True
+
+
+def preload(path=DEFAULT_MODEL):
+    # Start loading in the background; returns at once.
+    entry, new = _entry(path)
+    if new:
+        threading.Thread(target=entry.load, name="vosk-preload", daemon=True).start()
+
+
+def get_model(path=DEFAULT_MODEL, timeout: float | None = None) -> Model:
+    entry, new = _entry(path)
+    if new:
+        entry.load()
+    if not entry.ready.wait(timeout):
+        raise TimeoutError(f"Vosk model {entry.path} still loading")
+    if entry.error is not None:
+        raise entry.error
+    return entry.model
+
+
+def new_recognizer(
+    path=DEFAULT_MODEL,
+    grammar: str | None = None,
+    rate: int = SAMPLE_RATE,
+) -> KaldiRecognizer:
+    model = get_model(path)
+    rec = KaldiRecognizer(model, rate, grammar) if grammar else KaldiRecognizer(model, rate)
+    rec.SetWords(True)
+    return rec
+
+
+def stats(path=DEFAULT_MODEL) -> dict:
+    entry = _entries.get(Path(path).resolve())
+    if entry is None or not entry.ready.is_set():
+        return {"loaded": False}
+    return {"loaded": entry.error is None, "load_s": entry.load_s, "rss_mb": entry.rss_mb}
+
+
+def main():
+    ap = argparse.ArgumentParser("Load Vosk models once and report load time and memory")
+    ap.add_argument("models", nargs="*", type=Path, default=[DEFAULT_MODEL])
+    ap.add_argument("--sessions", type=int, default=20, help="recognizers to create per model")
+    args = ap.parse_args()
+
+    print(f"[Vosk] baseline RSS {rss_mb():.0f} MB")
+    for path in args.models:
+        preload(path)
+        get_model(path)
+        st = stats(path)
+        t0 = time.perf_counter()
+        for _ in range(args.sessions):
+            new_recognizer(path)
+        per = (time.perf_counter() - t0) / args.sessions
+        print(f"  {path.name:32} load {st['load_s']:6.2f}s  +{st['rss_mb']:5.0f} MB"
+              f"  recognizer {1000 * per:6.2f} ms")
+    print(f"[Vosk] total RSS {rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
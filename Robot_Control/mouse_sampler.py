@@ -0,0 +1,126 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from typing import Callable
+
+from recorder import record
+from scheduler import SKIP, Scheduler, Task, get_scheduler
+
+MOUSE_HZ = 60
+SERVO_RANGE = (10, 170)
+
+
+class MouseSampler:
+    # The pynput callback only swaps in the latest (x, y); a scheduler
+    # task samples it at rate_hz, maps it across the real screen and
+    # submits it, so no mapping, Tk or serial work runs on the OS hook.
+
+    def __init__(
+        self,
+        submit: Callable[[int, int], None],
+        screen: tuple[int, int],
+        rate_hz: float = MOUSE_HZ,
+        scheduler: Scheduler | None = None,
+    ):
+        self._submit = submit
+        self.screen = screen
+        self.rate_hz = rate_hz
+        self._scheduler = scheduler
+        self._latest: tuple[int, int] | None = None
+        self._sampled: tuple[int, int] | None = None
+        self.task: Task | None = None
+        self.events = 0
+        self.samples = 0
+
+    @property
+    def position(self) -> tuple[int, int]:
+        return self._latest or (0, 0)
+
+    def on_move(self, x, y):
+        # One reference swap; the counter is for stats only.
+        self._latest = (x, y)
+        self.events += 1
+
+    def map(self, x, y) -> tuple[int, int]:
+        lo, hi = SERVO_RANGE
+        w, h = self.screen
+        fx = min(max(x / max(w - 1, 1), 0.0), 1.0)
+        fy = min(max(y / max(h - 1, 1), 0.0), 1.0)
+        return int(lo + fx * (hi - lo)), int(lo + fy * (hi - lo))
+
+    def _tick(self, now: float):
+        pos = self._latest
+        if pos is None or pos == self._sampled:
+            return None
+        self._sampled = pos
+        self.samples += 1
+        record("mouse", pos)
+        self._submit(*self.map(*pos))
+
+    def start(self):
+        if self.task is None or not self.task.active:
+            self._sampled = None
+            sched = self._scheduler or get_scheduler()
+            self.task = sched.every(1 / self.rate_hz, self._tick, SKIP, "mouse")
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def stats(self) -> dict:
+        return {"events": self.events, "samples": self.samples}
+
+
+# BENCHMARK
+def main():
+    from arbiter import Arbiter
+    from robot_state import RobotState
+
+    ap = argparse.ArgumentParser("Flood synthetic mouse events and time the listener callback")
+    ap.add_argument("--events", type=int, default=200_000)
+    ap.add_argument("--rate-hz", type=float, default=MOUSE_HZ)
+    ap.add_argument("--screen", type=int, nargs=2, default=(2560, 1440), metavar=("W", "H"))
+    args = ap.parse_args()
+
+    sent: list[tuple] = []
+    arb = Arbiter(RobotState(), sent.append)
+    w, h = args.screen
+
+    def on_move_old(x, y):
+        # The previous callback: map against 1920 and submit inline
+        arb.submit("mouse", servo1=10 + x * 160 // 1920, servo3=10 + y * 160 // 1920)
+
+    sched = Scheduler("mouse-bench")
+    sched.start()
+    sampler = MouseSampler(lambda s1, s3: arb.submit("mouse", servo1=s1, servo3=s3),
+                           (w, h), args.rate_hz, sched)
+
+    def flood(handler) -> tuple[list[float], float]:
+        lat = []
+        t0 = time.perf_counter()
+        for n in range(args.events):
+            t = time.perf_counter()
+            handler(n * 7 % w, n * 3 % h)
+            lat.append(time.perf_counter() - t)
+        lat.sort()
+        return lat, time.perf_counter() - t0
+
+    old_lat, _ = flood(on_move_old)
+    old_sent = len(sent)
+    sent.clear()
+    sampler.start()
+    new_lat, span = flood(sampler.on_move)
+    time.sleep(2 / args.rate_hz)
+    sampler.stop()
+    sched.stop()
+
+    print(f"[Mouse] {args.events} synthetic moves, screen {w}x{h}, sampler at {args.rate_hz:.0f} Hz")
+    for name, lat in (("inline", old_lat), ("sampler", new_lat)):
+        print(f"  {name:16} p50 {1e6 * lat[len(lat) // 2]:6.2f} us  p99 {1e6 * lat[int(0.99 * (len(lat) - 1))]:6.2f} us"
+              f"  max {1e6 * lat[-1]:8.1f} us")
+    print(f"  frames           inline {old_sent}  sampler {len(sent)} over {span:.2f}s")
+    print(f"  sampler          {sampler.stats()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import argparse, random, sys
+from typing import Sequence
+
+
+class PoseFilter:
+    # Sits in front of the serial writer for every input mode. A pose is
+    # only sent when some axis moved past its deadband, no faster than
+    # max_rate_hz. Changes on state_axes (the claw) always go out at once.
+
+    def __init__(
+        self,
+        deadband: int | Sequence[int] = 2,
+        max_rate_hz: float | None = None,
+        state_axes: Sequence[int] = (),
+    ):
+        self.deadband = deadband
+        self.min_interval = 1 / max_rate_hz if max_rate_hz else 0.0
+        self.state_axes = tuple(state_axes)
+        self.last_sent: tuple | None = None
+        self.last_sent_t = float("-inf")
+        self.passed = 0
+        self.suppressed = 0
+
+    def _band(self, axis: int) -> int:
+        if isinstance(self.deadband, int):
+            return self.deadband
+        return self.deadband[axis]
+
+    def state_changed(self, pose: tuple) -> bool:
+        last = self.last_sent
+        return last is None or any(pose[i] != last[i] for i in self.state_axes)
+
+    def redundant(self, pose: tuple, force: bool = False) -> bool:
+        last = self.last_sent
+        if last is None or len(last) != len(pose) or self.state_changed(pose):
+            return False
+        if force:
+            return pose == last
+        return all(abs(p - q) < self._band(i) or p == q for i, (p, q) in enumerate(zip(pose, last)))
+
+    def next_send(self, pose: tuple, now: float) -> float:
+        if self.state_changed(pose):
+            return now
+        return self.last_sent_t + self.min_interval
+
+    def check(self, pose: tuple, force: bool = False) -> bool:
+        # force skips the deadband (not the rate limit) so a settled pose
+        # always lands exactly.
+        if self.redundant(pose, force):
+            self.suppressed += 1
+            return False
+        return True
+
+    def commit(self, pose: tuple, now: float):
+        # Only once the frame is actually on the wire; a failed write must
+        # not make the next identical pose look redundant.
+        self.passed += 1
+        self.last_sent = pose
+        self.last_sent_t = now
+
+    def accept(self, pose: tuple, now: float, force: bool = False) -> bool:
+        if not self.check(pose, force):
+            return False
+        self.commit(pose, now)
+        return True
+
+    def reset(self):
+        # The board lost its pose (it resets when the port opens).
+        self.last_sent = None
+        self.last_sent_t = float("-inf")
+
+    def stats(self) -> dict:
+        return {"passed": self.passed, "suppressed": self.suppressed}
+
+
+# SIMULATION
+def _steady_hand(n: int, rng: random.Random):
+    # Landmark jitter after mapping: +-1 deg flicker around a fixed pose.
+    return [(90 + rng.choice((-1, 0, 0, 1)), 140, 90 + rng.choice((-1, 0, 1))) for _ in range(n)]
+
+
+def simulate(filt: PoseFilter, poses: list[tuple], rate_hz: float) -> int:
+    pending = None
+    for i, pose in enumerate(poses):
+        now = i / rate_hz
+        pending = pose
+        if filt.next_send(pending, now) <= now:
+            filt.accept(pending, now)
+            pending = None
+    return filt.passed
+
+
+def main():
+    ap = argparse.ArgumentParser("Redundant-traffic simulation for the pose filter")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--max-rate", type=float, default=50.0)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    cases = {
+        "steady hand @ 30 Hz": (_steady_hand(int(30 * args.seconds), rng), 30.0, 3),
+        "still mouse @ 1 kHz": ([(90, 140, 90)] * int(1000 * args.seconds), 1000.0, 2),
+        "mouse sweep @ 1 kHz": ([(10 + (i // 20) % 160, 140, 90) for i in range(int(1000 * args.seconds))], 1000.0, 2),
+    }
+    for name, (poses, rate, deadband) in cases.items():
+        filt = PoseFilter(deadband, args.max_rate, state_axes=(1,))
+        sent = simulate(filt, poses, rate)
+        print(f"  {name:22} in {len(poses):6}  sent {sent:5}  ({len(poses) / max(sent, 1):.0f}x fewer)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import argparse, itertools, random, sys
+from typing import NamedTuple
+
+# Wire format, shared with Robot_Control.ino
+#
+#   v1 (legacy):  FF  lo1 hi1  lo2 hi2  lo3 hi3          (7 bytes, no check)
+#   v2:           FE  hdr  a1 .. an  crc                  (n + 3 bytes)
+#                 hdr = count << 5 | seq   (count 1..7, seq 0..31)
+#                 crc = CRC-8/0x07 over hdr and the angle bytes
+#   v2 control:   FE  hdr(count=0)  op  arg  crc          (5 bytes)
+#
+# Angles are 0..180 so neither sync byte can appear inside an angle.
+
+VERSION = 2
+SYNC_V1 = 0xFF
+SYNC_V2 = 0xFE
+MAX_SERVOS = 7
+SEQ_MASK = 0x1F
+
+OP_SET_BAUD = 0x01
+OP_ACK      = 0x02
+
+# Index is what goes over the wire in OP_SET_BAUD; all exact on a 16 MHz Uno.
+BAUD_RATES = (9600, 57600, 115200, 250000, 500000, 1000000)
+DEFAULT_BAUD = 115200
+
+
+def _crc8_table() -> list[int]:
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ 0x07) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return table
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data: bytes | bytearray) -> int:
+    c = 0
+    for b in data:
+        c = CRC8_TABLE[c ^ b]
+    return c
+
+
+def frame_size(n_servos: int) -> int:
+    return n_servos + 3
+
+
+class Encoder:
+    def __init__(self):
+        self._seq = itertools.count()
+
+    def encode(self, angles) -> bytes:
+        n = len(angles)
+        if not 1 <= n <= MAX_SERVOS:
+            raise ValueError(f"v2 frames carry 1..{MAX_SERVOS} servos, got {n}")
+        body = bytearray(n + 1)
+        body[0] = n << 5 | next(self._seq) & SEQ_MASK
+        for i, a in enumerate(angles):
+            body[i + 1] = max(0, min(int(a), 180))
+        return bytes((SYNC_V2, *body, crc8(body)))
+
+    def encode_control(self, op: int, arg: int) -> bytes:
+        body = bytes((next(self._seq) & SEQ_MASK, op, arg))
+        return bytes((SYNC_V2, *body, crc8(body)))
+
+
+# One sequence counter per process, shared by every sender on the link.
+_encoder = Encoder()
+encode = _encoder.encode
+encode_control = _encoder.encode_control
+
+
+class Frame(NamedTuple):
+    version: int
+    seq: int
+    angles: tuple
+    op: int = 0
+    arg: int = 0
+
+
+class Decoder:
+    # Byte-at-a-time reference decoder; mirrors the parser in
+    # Robot_Control.ino so resync behaviour can be tested off-hardware.
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.skipped = 0
+
+    def feed(self, data: bytes) -> list[Frame]:
+        out = []
+        for b in data:
+            self._buf.append(b)
+            frame = self._parse()
+            while frame is not None:
+                out.append(frame)
+                frame = self._parse()
+        return out
+
+    def _parse(self) -> Frame | None:
+        buf = self._buf
+        while buf:
+            sync = buf[0]
+            if sync == SYNC_V1:
+                if len(buf) < 7:
+                    return None
+                vals = (buf[1] | buf[2] << 8, buf[3] | buf[4] << 8, buf[5] | buf[6] << 8)
+                if all(v <= 180 for v in vals):
+                    del buf[:7]
+                    self.frames += 1
+                    return Frame(1, 0, vals)
+                # Not a real v1 frame: treat the sync byte as noise.
+                del buf[0]
+                self.skipped += 1
+                continue
+
+            if sync == SYNC_V2:
+                if len(buf) < 2:
+                    return None
+                count = buf[1] >> 5
+                size = 5 if count == 0 else frame_size(count)
+                if len(buf) < size:
+                    return None
+                body = buf[1:size - 1]
+                if crc8(body) == buf[size - 1] and (count == 0 or max(body[1:]) <= 180):
+                    seq = body[0] & SEQ_MASK
+                    if count == 0:
+                        frame = Frame(2, seq, (), body[1], body[2])
+                    else:
+                        frame = Frame(2, seq, tuple(body[1:]))
+                    del buf[:size]
+                    self.frames += 1
+                    return frame
+                del buf[0]
+                self.crc_errors += 1
+                continue
+
+            del buf[0]
+            self.skipped += 1
+        return None
+
+
+# FUZZ
+def _fuzz(frames: int, noise: float, seed: int):
+    rng = random.Random(seed)
+    enc, dec = Encoder(), Decoder()
+    sent = []
+    stream = bytearray()
+    for _ in range(frames):
+        angles = tuple(rng.randint(0, 180) for _ in range(rng.choice((3, 5))))
+        sent.append(angles)
+        frame = bytearray(enc.encode(angles))
+        if rng.random() < noise:
+            kind = rng.randrange(3)
+            if kind == 0:
+                frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+            elif kind == 1:
+                frame[rng.randrange(len(frame)):rng.randrange(len(frame)) + 1] = b""
+            else:
+                frame[:0] = bytes(rng.randrange(256) for _ in range(rng.randint(1, 6)))
+        stream += frame
+
+    got = [f.angles for f in dec.feed(bytes(stream)) if f.version == 2]
+    want = set(sent)
+    bogus = sum(1 for a in got if a not in want)
+    return len(sent), len(got), bogus, dec
+
+
+def main():
+    ap = argparse.ArgumentParser("Line-noise fuzz test for the v2 decoder")
+    ap.add_argument("--frames", type=int, default=100_000)
+    ap.add_argument("--noise", type=float, default=0.05, help="Fraction of frames corrupted")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    sent, got, bogus, dec = _fuzz(args.frames, args.noise, args.seed)
+    print(f"[Protocol v{VERSION}] {sent} frames, {args.noise:.0%} corrupted")
+    print(f"  decoded          {got}")
+    print(f"  lost             {sent - got + bogus}")
+    print(f"  false_accepts    {bogus}")
+    print(f"  crc_errors       {dec.crc_errors}")
+    print(f"  skipped_bytes    {dec.skipped}")
+    for baud in (9600, DEFAULT_BAUD):
+        print(f"  3-servo @ {baud:>6}: v1 {7 * 10e3 / baud:.2f} ms, v2 {frame_size(3) * 10e3 / baud:.2f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+from __future__ import annotations
+import argparse, mmap, os, sys, threading, time
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+SESSION_DIR = HERE.parent / "Sessions"
+
+# ROBOT_RECORD=<dir or .jbrec file> turns recording on for the process;
+# ROBOT_RECORD=1 records into SESSION_DIR
+RECORD_ENV = "ROBOT_RECORD"
+
+MAGIC = b"JBREC\x00\x00\x01"
+DEFAULT_CAPACITY = 1 << 20   # records; 64 MiB, about 17 minutes at 1 kHz
+N_VALUES = 8
+NAN = float("nan")
+
+KINDS = {
+    "mouse":     1,   # cursor x, y
+    "joystick":  2,   # x, y, hat, twist, throttle, buttons
+    "landmarks": 3,   # hand points, N_VALUES per record, aux = chunk index
+    "voice":     4,   # text = recognized word
+    "intent":    5,   # text = source; servo1-3, claw (NaN = axis not claimed)
+    "pose":      6,   # arbiter output: version, servo1-3, claw
+    "frame":     7,   # wire tuple written to the port
+}
+KIND_NAMES = {v: k for k, v in KINDS.items()}
+
+HEADER = np.dtype([
+    ("magic", "S8"),
+    ("record_size", "<u4"),
+    ("capacity", "<u4"),
+    ("written", "<u8"),      # records ever written; slot = written % capacity
+    ("start_wall", "<f8"),   # time.time() at t = 0
+    ("pad", "V32"),
+])
+RECORD = np.dtype([
+    ("t", "<f8"),            # seconds since the session started
+    ("kind", "u1"),
+    ("aux", "u1"),
+    ("n", "<u2"),            # values used
+    ("seq", "<u4"),
+    ("v", "<f4", (N_VALUES,)),
+    ("text", "S16"),
+])
+_PAD = (NAN,) * N_VALUES
+
+
+class Recorder:
+    # Fixed 64-byte records in a ring preallocated in a memory-mapped file.
+    # A record is one slot assignment plus a header counter bump; nothing is
+    # formatted or flushed on the hot path, and the OS keeps the pages if
+    # the process dies.
+
+    def __init__(self, path: str | Path, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = HEADER.itemsize + capacity * RECORD.itemsize
+        with open(self.path, "wb") as f:
+            f.truncate(size)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._header = np.ndarray((), HEADER, buffer=self._mm)
+        self._rec = np.ndarray((capacity,), RECORD, buffer=self._mm, offset=HEADER.itemsize)
+        self._header["magic"] = MAGIC
+        self._header["record_size"] = RECORD.itemsize
+        self._header["capacity"] = capacity
+        self._header["start_wall"] = time.time()
+        self._t0 = time.perf_counter()
+        self.capacity = capacity
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def record(self, kind: str, values: Sequence[float] = (), text: str = "", aux: int = 0, t: float | None = None):
+        t = (t if t is not None else time.perf_counter()) - self._t0
+        used = len(values)
+        values = tuple(values) + _PAD[used:]
+        code = KINDS[kind]
+        text = text.encode()[:16]
+        with self._lock:
+            n = self._written
+            self._rec[n % self.capacity] = (t, code, aux, used, n & 0xFFFFFFFF, values, text)
+            self._written = n + 1
+            self._header["written"] = n + 1
+
+    def record_array(self, kind: str, values: np.ndarray, text: str = "", t: float | None = None):
+        # Larger payloads (21 hand landmarks) span consecutive records.
+        flat = np.asarray(values, dtype=float).ravel()
+        t = t if t is not None else time.perf_counter()
+        for i in range(0, len(flat), N_VALUES):
+            self.record(kind, flat[i:i + N_VALUES].tolist(), text, i // N_VALUES, t)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        with self._lock:
+            if self._mm.closed:
+                return
+            del self._header, self._rec
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+
+
+_recorder: Recorder | None = None
+_recorder_ready = False
+_recorder_lock = threading.Lock()
+
+
+def get_recorder() -> Recorder | None:
+    # The process-wide session, opened on first use if ROBOT_RECORD is set.
+    global _recorder, _recorder_ready
+    if _recorder_ready:
+        return _recorder
+    with _recorder_lock:
+        if not _recorder_ready:
+            target = os.environ.get(RECORD_ENV)
+            if target:
+                path = SESSION_DIR if target == "1" else Path(target)
+                if path.suffix != ".jbrec":
+                    path = path / time.strftime("session-%Y%m%d-%H%M%S.jbrec")
+                _recorder = Recorder(path)
+                print(f"[Recorder] recording to {path}")
+            _recorder_ready = True
+    return _recorder
+
+
+def record(kind: str, values: Sequence[float] = (), text: str = "", aux: int = 0):
+    rec = _recorder if _recorder_ready else get_recorder()
+    if rec is not None:
+        rec.record(kind, values, text, aux)
+
+
+def record_array(kind: str, values: np.ndarray, text: str = ""):
+    rec = _recorder if _recorder_ready else get_recorder()
+    if rec is not None:
+        rec.record_array(kind, values, text)
+
+
+# READER
+class Session(NamedTuple):
+    path: Path
+    start_wall: float
+    capacity: int
+    written: int
+    events: np.ndarray   # RECORD array, oldest first
+
+    @property
+    def dropped(self) -> int:
+        # Records overwritten after the ring wrapped
+        return max(0, self.written - self.capacity)
+
+    def of(self, kind: str) -> np.ndarray:
+        return self.events[self.events["kind"] == KINDS[kind]]
+
+    def landmarks(self, points: int = 21) -> tuple[np.ndarray, np.ndarray]:
+        # (t, (n, points, 3)) for every complete landmark set in the session
+        rec = self.of("landmarks")
+        per = -(-points * 3 // N_VALUES)
+        starts = np.flatnonzero(rec["aux"] == 0)
+        starts = starts[starts + per <= len(rec)]
+        idx = starts[:, None] + np.arange(per)
+        # drop sets cut short by the ring wrap or interleaved with another hand
+        idx = idx[(rec["aux"][idx] == np.arange(per)).all(axis=1)] if len(idx) else idx
+        starts = idx[:, 0] if len(idx) else starts[:0]
+        flat = rec["v"][idx].reshape(len(starts), -1)[:, :points * 3]
+        return rec["t"][starts], flat.reshape(len(starts), points, 3)
+
+
+def load_session(path: str | Path) -> Session:
+    path = Path(path)
+    raw = np.fromfile(path, dtype=np.uint8)
+    header = raw[:HEADER.itemsize].view(HEADER)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path}: not a session recording")
+    if header["record_size"] != RECORD.itemsize:
+        raise ValueError(f"{path}: record size {header['record_size']}, expected {RECORD.itemsize}")
+    capacity, written = int(header["capacity"]), int(header["written"])
+    ring = raw[HEADER.itemsize:HEADER.itemsize + capacity * RECORD.itemsize].view(RECORD)
+    if written > capacity:
+        events = np.roll(ring, -(written % capacity))   # oldest surviving record first
+    else:
+        events = ring[:written].copy()
+    return Session(path, float(header["start_wall"]), capacity, written, events)
+
+
+# BENCHMARK
+def main():
+    ap = argparse.ArgumentParser("Summarize a session recording, or time the recorder's hot path")
+    ap.add_argument("session", nargs="?", type=Path, help=".jbrec file to summarize")
+    ap.add_argument("--events", type=int, default=200_000)
+    ap.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    args = ap.parse_args()
+
+    if args.session:
+        s = load_session(args.session)
+        span = s.events["t"][-1] - s.events["t"][0] if len(s.events) else 0.0
+        print(f"[Recorder] {s.path.name}: {len(s.events)} records over {span:.1f}s "
+              f"(started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(s.start_wall))}, {s.dropped} overwritten)")
+        for kind, code in KINDS.items():
+            count = int((s.events["kind"] == code).sum())
+            if count:
+                print(f"  {kind:16} {count}")
+        return 0
+
+    import tempfile
+    path = Path(tempfile.mkdtemp()) / "bench.jbrec"
+    rec = Recorder(path, args.capacity)
+    lat = []
+    for i in range(args.events):
+        t = time.perf_counter()
+        rec.record("intent", (i % 180, 90, 180 - i % 180, i & 1), "mouse")
+        lat.append(time.perf_counter() - t)
+    rec.close()
+    lat.sort()
+
+    t = time.perf_counter()
+    s = load_session(path)
+    load_ms = 1000 * (time.perf_counter() - t)
+    path.unlink()
+
+    print(f"[Recorder] {args.events} records into a {args.capacity}-slot ring ({RECORD.itemsize} B each)")
+    print(f"  record           p50 {1e6 * lat[len(lat) // 2]:.2f} us  p99 {1e6 * lat[int(0.99 * (len(lat) - 1))]:.2f} us")
+    print(f"  load_session     {load_ms:.1f} ms for {len(s.events)} records, {s.dropped} overwritten")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import argparse, os, sys, threading, time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from recorder import Session, load_session
+
+SPIN_S = 0.001   # sleep until this close to a deadline, then spin
+
+# What a replay re-emits, both written to the link one frame per command so
+# nothing is re-planned, deadbanded, rate limited or coalesced on the way out:
+#   pose   arbiter output as its wire frame
+#   frame  wire tuples exactly as they were written, for link stress tests
+SOURCES = ("pose", "frame")
+
+
+def replay_events(session: Session, source: str = "pose") -> tuple[np.ndarray, list[tuple]]:
+    # (t, commands) in recorded order; a pose becomes its wire frame.
+    rec = session.of(source)
+    v = rec["v"]
+    if source == "pose":
+        cmds = [tuple(map(int, row[1:4])) for row in v]
+    else:
+        cmds = [tuple(int(x) for x in row[:n]) for row, n in zip(v, rec["n"])]
+    return rec["t"].astype(float), cmds
+
+
+class Replayer:
+    # Re-emits a recorded command sequence in order. speed=1 keeps the
+    # original timing, other values scale it and speed=0 sends as fast as
+    # emit() returns. Deadlines are absolute, so one late command does not
+    # shift the rest of the session. emit() returns False for a command
+    # that did not reach the wire.
+
+    def __init__(self, t: np.ndarray, commands: list[tuple], emit: Callable[[tuple], bool | None], speed: float = 1.0):
+        self.t = t - t[0] if len(t) else t
+        self.commands = commands
+        self._emit = emit
+        self.speed = speed
+        self._stop = threading.Event()
+        self.sent = 0
+        self.failed = 0
+        self.emit_s: list[float] = []   # seconds spent in emit() per command
+        self.errors: list[float] = []   # seconds late per command (timed modes)
+        self.elapsed = 0.0
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self) -> dict:
+        t0 = time.perf_counter()
+        for rel, cmd in zip(self.t, self.commands):
+            if self._stop.is_set():
+                break
+            if self.speed > 0:
+                due = t0 + rel / self.speed
+                wait = due - time.perf_counter()
+                if wait > SPIN_S:
+                    self._stop.wait(wait - SPIN_S)
+                while time.perf_counter() < due:
+                    time.sleep(0)   # spin, but let the link's threads run
+                self.errors.append(time.perf_counter() - due)
+            t_emit = time.perf_counter()
+            if self._emit(cmd) is False:
+                self.failed += 1
+            self.emit_s.append(time.perf_counter() - t_emit)
+            self.sent += 1
+        self.elapsed = time.perf_counter() - t0
+        return self.stats()
+
+    def stats(self) -> dict:
+        span = float(self.t[self.sent - 1]) if self.sent else 0.0
+        written = self.sent - self.failed
+        out = {
+            "commands": self.sent,
+            "written": written,
+            "failed": self.failed,
+            "recorded_rate": self.sent / span if span else 0.0,
+            "achieved_rate": written / self.elapsed if self.elapsed else 0.0,
+        }
+        if self.emit_s:
+            emit = np.sort(np.asarray(self.emit_s))
+            out["emit_mean_ms"] = 1000 * float(emit.mean())
+            out["emit_p99_ms"] = 1000 * float(emit[int(0.99 * (len(emit) - 1))])
+        if self.errors:
+            err = np.sort(np.asarray(self.errors))
+            out["error_mean_ms"] = 1000 * float(err.mean())
+            out["error_p99_ms"] = 1000 * float(err[int(0.99 * (len(err) - 1))])
+            out["error_max_ms"] = 1000 * float(err[-1])
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser("Replay a recorded session through the serial command path")
+    ap.add_argument("session", type=Path)
+    ap.add_argument("--source", choices=SOURCES, default="pose")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--speed", type=float, default=1.0, help="1 = original timing, 2 = twice as fast")
+    mode.add_argument("--fast", action="store_true", help="no pacing, for load testing")
+    ap.add_argument("--pty", action="store_true", help="drive a fake pty port instead of the Arduino")
+    ap.add_argument("--dry-run", action="store_true", help="time the replay without a serial link")
+    args = ap.parse_args()
+
+    session = load_session(args.session)
+    t, cmds = replay_events(session, args.source)
+    if not cmds:
+        print(f"[Replay] no {args.source} records in {args.session}", file=sys.stderr)
+        return 1
+
+    fake = None
+    link = None
+    if args.dry_run:
+        emit = lambda cmd: None
+    else:
+        if args.pty:
+            from serial_link import PORT_ENV, PtyPort
+            fake = PtyPort()
+            fake.plug()
+            os.environ[PORT_ENV] = fake.path
+        from protocol import encode
+        from serial_link import get_link
+        link = get_link()
+        if not link.wait_connected(10.0):
+            print("[Replay] serial link did not come up", file=sys.stderr)
+            return 1
+        # Blocking write per command: SerialWriter would coalesce anything
+        # that arrives while a frame is on the wire, and its PoseFilter would
+        # filter commands that already passed one.
+        emit = lambda cmd: link.write(encode(cmd))
+
+    replayer = Replayer(t, cmds, emit, 0.0 if args.fast else args.speed)
+    try:
+        st = replayer.run()
+    except KeyboardInterrupt:
+        st = replayer.stats()
+    if link is not None:
+        time.sleep(0.2)   # let the last frame drain
+
+    label = "as fast as possible" if args.fast else f"{args.speed:g}x"
+    print(f"[Replay] {args.session.name}: {st['commands']}/{len(cmds)} {args.source} commands at {label}")
+    if session.dropped:
+        print(f"  ring_overwritten {session.dropped} records lost before the replayed window")
+    print(f"  recorded_rate    {st['recorded_rate']:.1f}/s")
+    print(f"  achieved_rate    {st['achieved_rate']:.1f}/s")
+    if "error_mean_ms" in st:
+        print(f"  timing_error     mean {st['error_mean_ms']:.3f}  p99 {st['error_p99_ms']:.3f}  max {st['error_max_ms']:.3f} ms")
+    if link is not None:
+        print(f"  frames           written {st['written']}  failed {st['failed']}")
+        if "emit_mean_ms" in st:
+            print(f"  write_latency    mean {st['emit_mean_ms']:.2f}  p99 {st['emit_p99_ms']:.2f} ms")
+    if fake is not None:
+        print(f"  bytes_on_wire    {fake.received}")
+        fake.unplug()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from typing import Callable, NamedTuple
+
+SERVO_MIN, SERVO_MAX = 0, 180
+
+# Power-on pose of the firmware's three servos
+HOME = (90, 140, 90)
+
+
+class Pose(NamedTuple):
+    # Immutable snapshot; servo numbering follows the frame sent to the
+    # Arduino (servo1 wrist/pan, servo2 claw or tilt, servo3 elbow).
+    version: int
+    servo1: int
+    servo2: int
+    servo3: int
+    claw_grabbing: bool
+    source: str
+    t: float
+
+    @property
+    def servos(self) -> tuple[int, int, int]:
+        return (self.servo1, self.servo2, self.servo3)
+
+
+def _clamp(v) -> int:
+    return max(SERVO_MIN, min(SERVO_MAX, int(v)))
+
+
+class RobotState:
+    # Single owner of the arm pose for every input mode. Writers build a new
+    # Pose under a writer-only lock and publish it with one reference swap;
+    # readers just take .pose and always see a complete, consistent
+    # snapshot without locking.
+    __slots__ = ("_pose", "_write_lock", "_listeners", "claw_lock")
+
+    def __init__(self, servos: tuple[int, int, int] = HOME, claw_grabbing: bool = False):
+        self._pose = Pose(0, *(_clamp(s) for s in servos), claw_grabbing, "init", time.perf_counter())
+        self._write_lock = threading.Lock()
+        self._listeners: tuple[Callable[[Pose], None], ...] = ()
+        # Held while a claw move is in progress; take it with blocking=False.
+        self.claw_lock = threading.Lock()
+
+    @property
+    def pose(self) -> Pose:
+        return self._pose
+
+    @property
+    def version(self) -> int:
+        return self._pose.version
+
+    def subscribe(self, cb: Callable[[Pose], None]):
+        with self._write_lock:
+            self._listeners = self._listeners + (cb,)
+
+    def update(self, source: str, **changes) -> Pose:
+        return self.apply(source, lambda pose: changes)
+
+    def apply(self, source: str, fn: Callable[[Pose], dict]) -> Pose:
+        # Read-modify-write: fn sees the latest pose and returns the fields
+        # to change, all under the writer lock.
+        with self._write_lock:
+            old = self._pose
+            changes = fn(old)
+            for k in ("servo1", "servo2", "servo3"):
+                if k in changes:
+                    changes[k] = _clamp(changes[k])
+            new = old._replace(version=old.version + 1, source=source, t=time.perf_counter(), **changes)
+            self._pose = new
+            listeners = self._listeners
+        for cb in listeners:
+            cb(new)
+        return new
+
+
+_state: RobotState | None = None
+_state_lock = threading.Lock()
+
+
+def get_state() -> RobotState:
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = RobotState()
+        return _state
+
+
+# BENCHMARK
+def main():
+    ap = argparse.ArgumentParser("Hammer the shared state from writer threads while readers check snapshots")
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=2.0)
+    args = ap.parse_args()
+
+    state = RobotState()
+    stop = threading.Event()
+    writes = [0] * args.writers
+    reads = [0] * args.readers
+    torn = [0]
+
+    def writer(i):
+        n = 0
+        while not stop.is_set():
+            n = (n + 1) % 180
+            # every field carries the same value, so a mixed pose is torn
+            state.update(f"w{i}", servo1=n, servo2=n, servo3=n, claw_grabbing=bool(n & 1))
+            writes[i] += 1
+
+    def reader(i):
+        last = -1
+        while not stop.is_set():
+            p = state.pose
+            if not (p.servo1 == p.servo2 == p.servo3) or (p.version and p.claw_grabbing != bool(p.servo1 & 1)):
+                torn[0] += 1
+            if p.version < last:
+                torn[0] += 1
+            last = p.version
+            reads[i] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(f"[State] {args.writers} writers, {args.readers} readers, {args.seconds:.0f}s")
+    print(f"  writes           {sum(writes)}  ({sum(writes) / args.seconds:,.0f}/s)")
+    print(f"  reads            {sum(reads)}  ({sum(reads) / args.seconds:,.0f}/s)")
+    print(f"  final_version    {state.version}")
+    print(f"  inconsistent     {torn[0]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import argparse, heapq, itertools, sys, threading, time
+from collections import deque
+from typing import Callable
+
+# What to do when a task falls behind by more than one period
+CATCH_UP = "catch_up"   # run the missed ticks back to back
+SKIP     = "skip"       # drop missed ticks and realign to the period grid
+
+
+class Task:
+    # A timed behaviour run by a Scheduler. fn(now) is called on every tick
+    # and may return False to end the task; period=None makes a one-shot.
+
+    def __init__(
+        self,
+        fn: Callable[[float], bool | None],
+        period: float | None,
+        policy: str,
+        name: str,
+        due: float,
+        history: int,
+    ):
+        self.fn = fn
+        self.period = period
+        self.policy = policy
+        self.name = name
+        self.due = due
+        self.done = threading.Event()
+
+        self.runs = 0
+        self.missed = 0
+        self._late: deque[float] = deque(maxlen=history)
+
+    @property
+    def active(self) -> bool:
+        return not self.done.is_set()
+
+    def cancel(self):
+        self.done.set()
+
+    def stats(self) -> dict:
+        late = sorted(self._late)
+        return {
+            "runs": self.runs,
+            "missed": self.missed,
+            "jitter_mean_ms": 1000 * sum(late) / len(late) if late else 0.0,
+            "jitter_p99_ms": 1000 * late[int(0.99 * (len(late) - 1))] if late else 0.0,
+            "jitter_max_ms": 1000 * late[-1] if late else 0.0,
+        }
+
+
+class Scheduler:
+    # One thread runs every timed behaviour off a deadline heap on the
+    # monotonic perf_counter clock. Deadlines advance by the period rather
+    # than by "now + period", so the time a tick spends sending does not
+    # accumulate as drift.
+
+    def __init__(self, name: str = "scheduler", history: int = 1000):
+        self.name = name
+        self.history = history
+        self._heap: list[tuple[float, int, Task]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self.tasks: dict[str, Task] = {}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def every(
+        self,
+        period: float,
+        fn: Callable[[float], bool | None],
+        policy: str = SKIP,
+        name: str | None = None,
+        delay: float = 0.0,
+    ) -> Task:
+        return self._add(fn, period, policy, name, delay)
+
+    def after(self, delay: float, fn: Callable[[float], bool | None], name: str | None = None) -> Task:
+        return self._add(fn, None, SKIP, name, delay)
+
+    def _add(self, fn, period, policy, name, delay) -> Task:
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"unknown policy {policy!r}")
+        name = name or getattr(fn, "__name__", "task")
+        task = Task(fn, period, policy, name, time.perf_counter() + delay, self.history)
+        with self._cond:
+            self.tasks[name] = task
+            heapq.heappush(self._heap, (task.due, next(self._seq), task))
+            self._cond.notify()
+        return task
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    while self._heap and not self._heap[0][2].active:
+                        heapq.heappop(self._heap)
+                    if self._heap:
+                        delay = self._heap[0][0] - time.perf_counter()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    return
+                due, _, task = heapq.heappop(self._heap)
+
+            now = time.perf_counter()
+            task._late.append(now - due)
+            task.runs += 1
+            try:
+                keep = task.fn(now) is not False
+            except Exception as e:
+                print(f"[Scheduler] {task.name} failed: {e}", file=sys.stderr)
+                keep = False
+            if not keep or task.period is None or not task.active:
+                task.done.set()
+                continue
+
+            task.due = due + task.period
+            now = time.perf_counter()
+            if task.policy == SKIP and task.due <= now:
+                behind = int((now - task.due) // task.period) + 1
+                task.missed += behind
+                task.due += behind * task.period
+            with self._cond:
+                heapq.heappush(self._heap, (task.due, next(self._seq), task))
+
+    def stats(self) -> dict:
+        with self._cond:
+            tasks = list(self.tasks.values())
+        return {t.name: t.stats() for t in tasks}
+
+
+_scheduler: Scheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    # Shared motion scheduler for the process; started on first use.
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler("motion-scheduler")
+            _scheduler.start()
+        return _scheduler
+
+
+# BENCHMARK
+def _sleep_loop(period: float, work: float, duration: float) -> list[float]:
+    # The old pattern: do the work, then sleep a full period.
+    late, start = [], time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < duration:
+        late.append(time.perf_counter() - (start + n * period))
+        time.sleep(work)
+        time.sleep(period)
+        n += 1
+    return late
+
+
+def main():
+    ap = argparse.ArgumentParser("Compare scheduler tick timing against a sleep-per-tick loop")
+    ap.add_argument("--hz", type=float, default=50.0)
+    ap.add_argument("--work-ms", type=float, default=2.0, help="simulated send time per tick")
+    ap.add_argument("--tasks", type=int, default=3)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+
+    period, work = 1 / args.hz, args.work_ms / 1000
+    sched = Scheduler()
+    sched.start()
+    for i in range(args.tasks):
+        sched.every(period, lambda now: time.sleep(work), name=f"task{i}")
+    time.sleep(args.seconds)
+    sched.stop()
+
+    late = _sleep_loop(period, work, args.seconds)
+    expected = int(args.seconds * args.hz)
+    print(f"[Scheduler] {args.tasks} tasks @ {args.hz:.0f} Hz, {args.work_ms:.1f} ms work, {args.seconds:.0f}s")
+    for name, st in sched.stats().items():
+        print(f"  {name:16} runs {st['runs']:5d}/{expected}  missed {st['missed']:3d}  "
+              f"jitter mean {st['jitter_mean_ms']:.2f} p99 {st['jitter_p99_ms']:.2f} max {st['jitter_max_ms']:.2f} ms")
+    print(f"  {'sleep loop':16} runs {len(late):5d}/{expected}  "
+          f"drift at end {1000 * late[-1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
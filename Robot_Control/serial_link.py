@@ -0,0 +1,307 @@
+from __future__ import annotations
+import argparse, os, sys, threading, time
+from typing import Callable
+
+import serial
+import serial.tools.list_ports as list_ports
+
+from protocol import BAUD_RATES, DEFAULT_BAUD, OP_ACK, OP_SET_BAUD, Decoder, encode, encode_control
+
+SETTLE_S     = 2.0    # the Uno resets when the port opens
+MIN_BACKOFF  = 0.25
+MAX_BACKOFF  = 8.0
+
+PORT_ENV = "ROBOT_SERIAL_PORT"
+
+
+def find_arduino_port() -> str | None:
+    override = os.environ.get(PORT_ENV)
+    if override:
+        return override
+    for p in list_ports.comports():
+        if "Arduino" in (p.description or "") or "usbmodem" in p.device:
+            return p.device
+    return None
+
+
+class SerialLink:
+    # Owns the one serial port of the process. Reconnection runs on a
+    # background thread with exponential backoff so write() never scans
+    # ports or sleeps; it just reports whether the bytes went out.
+
+    def __init__(
+        self,
+        baud: int = DEFAULT_BAUD,
+        target_baud: int | None = None,
+        finder: Callable[[], str | None] = find_arduino_port,
+        settle: float = SETTLE_S,
+        min_backoff: float = MIN_BACKOFF,
+        max_backoff: float = MAX_BACKOFF,
+    ):
+        self.boot_baud = baud
+        self.target_baud = target_baud or baud
+        self.baud = baud
+        self._finder = finder
+        self._settle = settle
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+
+        self._ser: serial.Serial | None = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._listeners: list[Callable[[bool], None]] = []
+
+        self.connected = threading.Event()
+        self.last_port: str | None = None
+        self.connects = 0
+        self.disconnects = 0
+        self.resets = 0
+        self.failed_attempts = 0
+        self.write_failures = 0
+
+    # STATE
+    @property
+    def is_connected(self) -> bool:
+        return self.connected.is_set()
+
+    def add_listener(self, cb: Callable[[bool], None]):
+        self._listeners.append(cb)
+
+    def _notify(self, up: bool):
+        for cb in list(self._listeners):
+            try:
+                cb(up)
+            except Exception as e:
+                print("[Serial] listener error:", e, file=sys.stderr)
+
+    def wait_connected(self, timeout: float | None = None) -> bool:
+        return self.connected.wait(timeout)
+
+    # LIFECYCLE
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="serial-link", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+        self._close()
+
+    def _close(self):
+        with self._lock:
+            ser, self._ser = self._ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def _open(self, port: str) -> bool:
+        try:
+            ser = serial.Serial(port, self.boot_baud, timeout=1, write_timeout=0.5)
+        except (serial.SerialException, OSError, ValueError):
+            return False
+        self.baud = self.boot_baud
+        if self._settle:
+            time.sleep(self._settle)
+        if self.target_baud != self.boot_baud:
+            self._negotiate(ser)
+        with self._lock:
+            self._ser = ser
+        self.last_port = port
+        return True
+
+    def _negotiate(self, ser: serial.Serial, timeout: float = 0.5):
+        # The board boots at boot_baud; ask it to switch and wait for its ack
+        # before following. Without an ack we stay at the boot rate.
+        idx = BAUD_RATES.index(self.target_baud)
+        dec = Decoder()
+        try:
+            ser.reset_input_buffer()
+            ser.write(encode_control(OP_SET_BAUD, idx))
+            ser.flush()
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                for f in dec.feed(ser.read(ser.in_waiting or 1)):
+                    if f.op == OP_ACK and f.arg == idx:
+                        ser.baudrate = self.target_baud
+                        self.baud = self.target_baud
+                        return
+        except (serial.SerialException, OSError):
+            pass
+        print(f"[Serial] baud negotiation failed, staying at {self.baud}", file=sys.stderr)
+
+    def _run(self):
+        backoff = self._min_backoff
+        while self._running:
+            if self.connected.is_set():
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            # Try the last good port first; only rescan when it is gone.
+            candidates = [self.last_port] if self.last_port else []
+            found = self._finder()
+            if found and found not in candidates:
+                candidates.append(found)
+
+            if any(self._open(p) for p in candidates):
+                backoff = self._min_backoff
+                self.connects += 1
+                self.connected.set()
+                print(f"Connected to Arduino on {self.last_port}")
+                self._notify(True)
+                continue
+
+            self.failed_attempts += 1
+            self._wake.wait(backoff)
+            self._wake.clear()
+            backoff = min(backoff * 2, self._max_backoff)
+
+    def mark_lost(self):
+        if self._drop("Arduino disconnected. Reconnecting in background..."):
+            self.disconnects += 1
+
+    def _drop(self, message: str) -> bool:
+        # Close the port, tell listeners, then wake the reconnect thread so
+        # the "up" can never overtake the "down". False if already down.
+        if not self.connected.is_set():
+            return False
+        self.connected.clear()
+        self._close()
+        print(message)
+        self._notify(False)
+        self._wake.set()
+        return True
+
+    # HOT PATH
+    def write(self, data: bytes) -> bool:
+        if not self.connected.is_set():
+            return False
+        try:
+            with self._lock:
+                if self._ser is None:
+                    return False
+                self._ser.write(data)
+            return True
+        except (serial.SerialException, OSError):
+            self.write_failures += 1
+            self.mark_lost()
+            return False
+
+    def reset_board(self):
+        # Reboot the Uno without blocking the caller: closing drops DTR and
+        # the reconnect thread's reopen raises it again, which resets the
+        # board, and _open waits out the boot. Listeners see the link go
+        # down and up, so SerialWriter resends the pose afterwards.
+        if self._drop("Resetting Arduino..."):
+            self.resets += 1
+
+
+_shared: SerialLink | None = None
+_shared_lock = threading.Lock()
+
+
+def get_link(baud: int = DEFAULT_BAUD, target_baud: int | None = None) -> SerialLink:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SerialLink(baud=baud, target_baud=target_baud)
+            _shared.start()
+        return _shared
+
+
+# PTY HARNESS
+class PtyPort:
+    # A pty pair that can be "unplugged" (master closed, slave writes fail
+    # with EIO) and "replugged" (fresh pair under a new device name).
+
+    def __init__(self):
+        self.master: int | None = None
+        self.slave: int | None = None
+        self.path: str | None = None
+        self.received = 0
+        self._reader: threading.Thread | None = None
+
+    def plug(self):
+        master, slave = os.openpty()
+        self.master, self.slave, self.path = master, slave, os.ttyname(slave)
+        self._reader = threading.Thread(target=self._drain, args=(master,), daemon=True)
+        self._reader.start()
+
+    def unplug(self):
+        fds = (self.master, self.slave)
+        self.master = self.slave = self.path = None
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+
+    def _drain(self, fd: int):
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            self.received += len(data)
+
+
+def main():
+    ap = argparse.ArgumentParser("Unplug/replug storm against the shared serial link")
+    ap.add_argument("--cycles", type=int, default=20)
+    ap.add_argument("--up", type=float, default=0.3, help="Seconds plugged per cycle")
+    ap.add_argument("--down", type=float, default=0.2, help="Seconds unplugged per cycle")
+    ap.add_argument("--rate", type=float, default=200.0, help="Writes per second")
+    args = ap.parse_args()
+
+    fake = PtyPort()
+    link = SerialLink(finder=lambda: fake.path, settle=0.0, min_backoff=0.01, max_backoff=0.2)
+    link.start()
+
+    blocked: list[float] = []
+    ok = 0
+    stop = threading.Event()
+
+    def sender():
+        nonlocal ok
+        period = 1 / args.rate
+        frame = encode((90, 90, 90))
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            ok += link.write(frame)
+            blocked.append(time.perf_counter() - t0)
+            time.sleep(period)
+
+    t = threading.Thread(target=sender, daemon=True)
+    t.start()
+    for _ in range(args.cycles):
+        fake.plug()
+        time.sleep(args.up)
+        fake.unplug()
+        time.sleep(args.down)
+    stop.set()
+    t.join()
+    link.stop()
+
+    blocked.sort()
+    print(f"[Link] {args.cycles} unplug/replug cycles, {len(blocked)} writes, {ok} delivered")
+    print(f"  connects         {link.connects}")
+    print(f"  disconnects      {link.disconnects}")
+    print(f"  failed_attempts  {link.failed_attempts}")
+    print(f"  bytes_received   {fake.received}")
+    print(f"  write_block_mean {1000 * sum(blocked) / len(blocked):.3f} ms")
+    print(f"  write_block_p99  {1000 * blocked[int(0.99 * (len(blocked) - 1))]:.3f} ms")
+    print(f"  write_block_max  {1000 * blocked[-1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
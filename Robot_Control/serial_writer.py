@@ -0,0 +1,201 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from collections import deque
+from typing import Callable
+
+from protocol import DEFAULT_BAUD, encode, frame_size
+from pose_filter import PoseFilter
+from recorder import record
+from serial_link import SerialLink, PtyPort
+
+BITS_PER_BYTE = 10  # 8N1: start + 8 data + stop
+
+
+def wire_time(n_bytes: int, baud: int) -> float:
+    return n_bytes * BITS_PER_BYTE / baud
+
+
+class SerialWriter:
+    # Single transmit thread that only ever holds the latest target pose.
+    # Producers call submit() and never touch the port; anything submitted
+    # while a frame is still on the wire is coalesced into the next one.
+
+    def __init__(
+        self,
+        link: SerialLink,
+        encode: Callable[[tuple], bytes],
+        pose_filter: PoseFilter | None = None,
+        history: int = 1000,
+    ):
+        self._link = link
+        self._encode = encode
+        self.pose_filter = pose_filter
+
+        self._cond = threading.Condition()
+        self._pending: tuple | None = None
+        self._pending_t = 0.0
+        self._pending_force = False
+        self._latest: tuple | None = None   # last pose submitted, sent or not
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.resyncs = 0
+        self.last_sent: tuple | None = None
+        self._latency_sum = 0.0
+        self._latency_max = 0.0
+        self._latencies: deque[float] = deque(maxlen=history)
+        self._lock = threading.Lock()   # latency bookkeeping vs stats()
+        link.add_listener(self._on_link)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="serial-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _on_link(self, up: bool):
+        # The board boots to its home pose when the port opens, so resend
+        # whatever the host last commanded.
+        if not up:
+            return
+        with self._cond:
+            if self.pose_filter is not None:
+                self.pose_filter.reset()
+            latest = self._latest
+        if latest is not None:
+            self.submit(latest, force=True)
+            self.resyncs += 1
+
+    def submit(self, pose: tuple, force: bool = False):
+        with self._cond:
+            self.submitted += 1
+            self._latest = pose
+            if self._pending is None:
+                self._pending_t = time.perf_counter()
+            else:
+                self.dropped += 1
+            self._pending = pose
+            self._pending_force = force
+            self._cond.notify()
+
+    def _ready_at(self, now: float, next_slot: float) -> float:
+        if self.pose_filter is None:
+            return next_slot
+        return max(next_slot, self.pose_filter.next_send(self._pending, now))
+
+    def _run(self):
+        next_slot = 0.0
+        while True:
+            # Let the previous frame clear the wire (and the filter's rate
+            # limit pass); newer poses keep replacing the pending one.
+            with self._cond:
+                while self._running:
+                    if self._pending is None:
+                        self._cond.wait()
+                        continue
+                    now = time.perf_counter()
+                    ready = self._ready_at(now, next_slot)
+                    if ready <= now:
+                        break
+                    self._cond.wait(ready - now)
+                if not self._running:
+                    return
+                pose, t0, force = self._pending, self._pending_t, self._pending_force
+                self._pending = None
+
+            if self.pose_filter is not None and not self.pose_filter.check(pose, force):
+                continue
+
+            frame = self._encode(pose)
+            if not self._link.write(frame):
+                self.failed += 1
+                continue
+
+            now = time.perf_counter()
+            if self.pose_filter is not None:
+                self.pose_filter.commit(pose, now)
+            record("frame", pose)
+            next_slot = now + wire_time(len(frame), self._link.baud)
+            latency = now - t0
+            self.last_sent = pose
+            with self._lock:
+                self.sent += 1
+                self._latency_sum += latency
+                self._latency_max = max(self._latency_max, latency)
+                self._latencies.append(latency)
+
+    def stats(self) -> dict:
+        # Snapshot under the lock: sorting a deque the writer thread is
+        # appending to can raise RuntimeError.
+        with self._lock:
+            recent = list(self._latencies)
+            sent, latency_sum = self.sent, self._latency_sum
+        recent.sort()
+        return {
+            "submitted": self.submitted,
+            "sent": sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "resyncs": self.resyncs,
+            "latency_mean_ms": 1000 * latency_sum / sent if sent else 0.0,
+            "latency_p99_ms": 1000 * recent[int(0.99 * (len(recent) - 1))] if recent else 0.0,
+            "latency_max_ms": 1000 * self._latency_max,
+            "suppressed": self.pose_filter.suppressed if self.pose_filter else 0,
+        }
+
+
+# BENCHMARK
+def main():
+    ap = argparse.ArgumentParser("Move-storm benchmark for the coalescing serial writer")
+    ap.add_argument("--rate", type=float, default=1000.0, help="Submitted poses per second")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--baud", type=int, default=DEFAULT_BAUD)
+    args = ap.parse_args()
+
+    fake = PtyPort()
+    fake.plug()
+    link = SerialLink(baud=args.baud, finder=lambda: fake.path, settle=0.0)
+    link.start()
+    link.wait_connected(2.0)
+
+    writer = SerialWriter(link, encode)
+    writer.start()
+
+    period = 1 / args.rate
+    n = int(args.seconds * args.rate)
+    t_next = time.perf_counter()
+    for i in range(n):
+        writer.submit((i % 180, 90, 180 - i % 180))
+        t_next += period
+        delay = t_next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    time.sleep(0.1)
+    writer.stop()
+    link.stop()
+    fake.unplug()
+
+    stats = writer.stats()
+    print(f"[Writer] {n} poses @ {args.rate:.0f} Hz over {args.seconds:.1f}s, baud {args.baud}")
+    for k, v in stats.items():
+        print(f"  {k:16} {v:.2f}" if isinstance(v, float) else f"  {k:16} {v}")
+    print(f"  bytes_on_wire    {fake.received}")
+    print(f"  wire_slot_ms     {1000 * wire_time(frame_size(3), args.baud):.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
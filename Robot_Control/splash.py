@@ -0,0 +1,123 @@
+from __future__ import annotations
+import argparse, sys, time
+
+SPLASH_MODES = ("instant", "lines")
+SPLASH_MODE = "lines"
+SPLASH_DURATION = 0.6   # seconds for the whole reveal
+SPLASH_FPS = 30
+
+
+def reveal_frames(text: str, frames: int) -> list[str]:
+    # Whole-label strings for each step of a top-down line reveal. Lines
+    # not shown yet are blanked to spaces of the same width, so the label
+    # keeps its final size and the window never relayouts mid-animation.
+    lines = text.split("\n")
+    blank = [" " * len(line) for line in lines]
+    frames = max(1, min(frames, len(lines)))
+    out = []
+    for f in range(1, frames + 1):
+        shown = round(f * len(lines) / frames)
+        out.append("\n".join(lines[:shown] + blank[shown:]))
+    return out
+
+
+class Splash:
+    # Plays the logo on a Label from root.after(): a fixed number of
+    # frames, one configure() each, regardless of how long the art is.
+
+    def __init__(
+        self,
+        widget,
+        text: str,
+        mode: str = SPLASH_MODE,
+        duration: float = SPLASH_DURATION,
+        fps: float = SPLASH_FPS,
+    ):
+        if mode not in SPLASH_MODES:
+            raise ValueError(f"unknown splash mode {mode!r}, expected one of {SPLASH_MODES}")
+        self.widget = widget
+        if mode == "instant":
+            self._frames = [text]
+        else:
+            self._frames = reveal_frames(text, int(duration * fps))
+        self.period_ms = max(1, int(1000 * duration / len(self._frames)))
+        self._i = 0
+        self._after_id = None
+        self.configures = 0
+
+    @property
+    def done(self) -> bool:
+        return self._i >= len(self._frames)
+
+    def start(self, delay_ms: int = 0):
+        self._after_id = self.widget.after(delay_ms, self._tick)
+
+    def _tick(self):
+        self.widget.configure(text=self._frames[self._i])
+        self.configures += 1
+        self._i += 1
+        self._after_id = None if self.done else self.widget.after(self.period_ms, self._tick)
+
+    def cancel(self):
+        # Jump straight to the finished logo.
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if not self.done:
+            self._i = len(self._frames) - 1
+            self._tick()
+
+
+# BENCHMARK
+def main():
+    import tkinter as tk
+    from logo import ascii_art
+
+    ap = argparse.ArgumentParser("Compare the per-character splash with the chunked one")
+    ap.add_argument("--mode", choices=SPLASH_MODES, default=SPLASH_MODE)
+    ap.add_argument("--duration", type=float, default=SPLASH_DURATION)
+    ap.add_argument("--fps", type=float, default=SPLASH_FPS)
+    args = ap.parse_args()
+
+    root = tk.Tk()
+    label = tk.Label(root, font=("Courier New", 10), justify="center")
+    label.pack()
+    results = {}
+
+    def per_char(index=0):
+        # The previous renderer: one after() per character, each rebuilding the string
+        if index < len(ascii_art):
+            label.configure(text=label.cget("text") + ascii_art[index])
+            results["per_char_configures"] = index + 1
+            root.after(1, lambda: per_char(index + 1))
+        else:
+            results["per_char_s"] = time.perf_counter() - t0
+            label.configure(text="")
+            run_splash()
+
+    def run_splash():
+        t1 = time.perf_counter()
+        splash = Splash(label, ascii_art, args.mode, args.duration, args.fps)
+
+        def wait():
+            if splash.done:
+                results["splash_s"] = time.perf_counter() - t1
+                results["splash_configures"] = splash.configures
+                root.quit()
+            else:
+                root.after(5, wait)
+
+        splash.start()
+        wait()
+
+    t0 = time.perf_counter()
+    root.after(0, per_char)
+    root.mainloop()
+
+    print(f"[Splash] {len(ascii_art)} chars, {ascii_art.count(chr(10)) + 1} lines")
+    print(f"  per_char         {results['per_char_configures']} configures, {results['per_char_s']:.2f}s")
+    print(f"  {args.mode:16} {results['splash_configures']} configures, {results['splash_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
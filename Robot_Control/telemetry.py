@@ -0,0 +1,132 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from typing import Callable
+
+TELEMETRY_HZ = 20
+
+
+class TelemetryPanel:
+    # Tk-side telemetry refresh. Input threads never touch Tk: they only
+    # update state, and this polls the value functions from root.after()
+    # at rate_hz, reconfiguring a label only when its text changed.
+
+    def __init__(self, root, rate_hz: float = TELEMETRY_HZ):
+        self.root = root
+        self.period_ms = max(1, int(1000 / rate_hz))
+        self._rows: list[list] = []   # [label, text fn, last text]
+        self._after_id = None
+        self.refreshes = 0
+        self.label_updates = 0
+        self.busy = 0.0
+
+    def add(self, label, text: Callable[[], str]):
+        self._rows.append([label, text, None])
+
+    def refresh(self) -> int:
+        t0 = time.perf_counter()
+        changed = 0
+        for row in self._rows:
+            value = row[1]()
+            if value != row[2]:
+                row[0].config(text=value)
+                row[2] = value
+                changed += 1
+        self.refreshes += 1
+        self.label_updates += changed
+        self.busy += time.perf_counter() - t0
+        return changed
+
+    def _tick(self):
+        self.refresh()
+        self._after_id = self.root.after(self.period_ms, self._tick)
+
+    def start(self):
+        if self._after_id is None:
+            self._tick()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def stats(self) -> dict:
+        return {
+            "refreshes": self.refreshes,
+            "label_updates": self.label_updates,
+            "refresh_ms": 1000 * self.busy / self.refreshes if self.refreshes else 0.0,
+        }
+
+
+# BENCHMARK
+def main():
+    import tkinter as tk
+    from robot_state import RobotState
+
+    ap = argparse.ArgumentParser("Flood synthetic mouse events and time the input callback")
+    ap.add_argument("--events", type=int, default=20_000)
+    ap.add_argument("--rate-hz", type=float, default=TELEMETRY_HZ)
+    args = ap.parse_args()
+
+    root = tk.Tk()
+    labels = [tk.Label(root, text="") for _ in range(4)]
+    for label in labels:
+        label.pack()
+    state = RobotState()
+    pos = [0, 0]
+
+    def texts():
+        p = state.pose
+        return [
+            f"Mouse Position: ({pos[0]}, {pos[1]})",
+            f"Servo Positions: (Servo1: {p.servo1}, Servo2/Claw: {p.servo2}, Servo3: {p.servo3})",
+            f"Claw State: {'Grabbing' if p.claw_grabbing else 'Released'}",
+            "Arduino: Disconnected",
+        ]
+
+    def on_move_old(x, y):
+        # The previous handler: state change plus a synchronous Tk update
+        pos[:] = x, y
+        state.update("mouse", servo1=x * 160 // 1920 + 10, servo3=y * 160 // 1080 + 10)
+        for label, text in zip(labels, texts()):
+            label.config(text=text)
+
+    def on_move_new(x, y):
+        pos[:] = x, y
+        state.update("mouse", servo1=x * 160 // 1920 + 10, servo3=y * 160 // 1080 + 10)
+
+    panel = TelemetryPanel(root, args.rate_hz)
+    for i, label in enumerate(labels):
+        panel.add(label, lambda i=i: texts()[i])
+
+    results = {}
+
+    def flood(name, handler):
+        lat = []
+        for n in range(args.events):
+            t0 = time.perf_counter()
+            handler(n % 1920, n % 1080)
+            lat.append(time.perf_counter() - t0)
+        lat.sort()
+        results[name] = lat
+
+    def run():
+        flood("old", on_move_old)
+        flood("new", on_move_new)
+        root.after(0, root.quit)
+
+    panel.start()
+    threading.Thread(target=run, daemon=True).start()
+    root.mainloop()
+    panel.stop()
+
+    print(f"[Telemetry] {args.events} synthetic mouse events per handler, panel at {args.rate_hz:.0f} Hz")
+    for name, lat in results.items():
+        print(f"  {name:16} p50 {1e6 * lat[len(lat) // 2]:8.1f} us  p99 {1e6 * lat[int(0.99 * (len(lat) - 1))]:8.1f} us"
+              f"  max {1e6 * lat[-1]:8.1f} us")
+    st = panel.stats()
+    print(f"  panel            {st['refreshes']} refreshes, {st['label_updates']} label updates, "
+          f"{st['refresh_ms']:.3f} ms each")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
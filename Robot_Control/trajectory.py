@@ -0,0 +1,205 @@
+from __future__ import annotations
+import argparse, sys, threading, time
+from typing import Callable, Sequence
+
+import numpy as np
+
+CONTROL_HZ = 100
+MAX_VEL    = 180.0   # deg/s
+MAX_ACC    = 720.0   # deg/s^2
+
+
+def plan(
+    start: Sequence[float],
+    target: Sequence[float],
+    vmax: float | Sequence[float] = MAX_VEL,
+    amax: float | Sequence[float] = MAX_ACC,
+    rate_hz: float = CONTROL_HZ,
+    v0: Sequence[float] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    # Trapezoidal profile per joint, evaluated for all joints and all ticks in
+    # one pass. Each joint is four constant-acceleration phases:
+    #   brake (only when v0 points away or would overshoot), accelerate,
+    #   cruise, decelerate.
+    # Returns (positions, velocities), each shaped (ticks, joints); row 0 is
+    # the first tick after start.
+    x0 = np.asarray(start, dtype=float)
+    d = np.asarray(target, dtype=float) - x0
+    v0 = np.zeros_like(x0) if v0 is None else np.asarray(v0, dtype=float)
+    vmax = np.broadcast_to(np.asarray(vmax, dtype=float), x0.shape)
+    amax = np.broadcast_to(np.asarray(amax, dtype=float), x0.shape)
+
+    sgn = np.where(d != 0, np.sign(d), np.sign(v0))
+    dist = np.abs(d)
+    v_along = v0 * sgn   # velocity towards the target
+
+    stop_dist = v_along ** 2 / (2 * amax)
+    brake = (v_along < 0) | (stop_dist > dist)
+
+    # Phase A: brake to rest if needed
+    tA = np.where(brake, np.abs(v0) / amax, 0.0)
+    aA = np.where(brake, -np.sign(v0) * amax, 0.0)
+    xA = v0 * tA + 0.5 * aA * tA ** 2
+    rem = np.abs(d - xA)
+    sgn = np.where(brake, np.sign(d - xA), sgn)
+    vB = np.where(brake, 0.0, v_along)
+
+    # Phases B-D: accelerate from vB to vp, cruise, decelerate to rest
+    vp = np.minimum(vmax, np.sqrt(amax * rem + vB ** 2 / 2))
+    vp = np.maximum(vp, vB)
+    tB = (vp - vB) / amax
+    tD = vp / amax
+    dB = (vp ** 2 - vB ** 2) / (2 * amax)
+    dD = vp ** 2 / (2 * amax)
+    tC = np.where(vp > 0, np.maximum(rem - dB - dD, 0.0) / np.where(vp > 0, vp, 1.0), 0.0)
+
+    accel = np.stack([aA, sgn * amax, np.zeros_like(x0), -sgn * amax])
+    durations = np.stack([tA, tB, tC, tD])
+    starts = np.cumsum(durations, axis=0) - durations
+    v_start = np.stack([v0, sgn * vB, sgn * vp, sgn * vp])
+
+    total = durations.sum(axis=0).max()
+    n = max(1, int(np.ceil(total * rate_hz)))
+    t = (np.arange(1, n + 1) / rate_hz)[:, None, None]        # (n, 1, 1)
+    tau = np.clip(t - starts[None], 0.0, durations[None])     # (n, 4, J)
+    pos = x0 + (v_start * tau + 0.5 * accel * tau ** 2).sum(axis=1)
+    vel = (accel * tau).sum(axis=1) + v0
+    # Snap the tail so rounding never leaves a joint a hair short.
+    done = t[:, 0, :] >= durations.sum(axis=0)[None]
+    pos = np.where(done, x0 + d, pos)
+    vel = np.where(done, 0.0, vel)
+    return pos, vel
+
+
+class TrajectoryStreamer:
+    # Takes target poses from any input mode and emits interpolated poses at
+    # a fixed control rate. A new target re-plans from the current position
+    # and velocity, so retargeting mid-move stays smooth. emit() gets the
+    # pose and whether it is the settled end of the move.
+
+    def __init__(
+        self,
+        emit: Callable[[tuple, bool], None],
+        start: Sequence[float],
+        vmax: float | Sequence[float] = MAX_VEL,
+        amax: float | Sequence[float] = MAX_ACC,
+        rate_hz: float = CONTROL_HZ,
+    ):
+        self._emit = emit
+        self.vmax = vmax
+        self.amax = amax
+        self.rate_hz = rate_hz
+
+        self._pos = np.asarray(start, dtype=float)
+        self._vel = np.zeros_like(self._pos)
+        self._path: np.ndarray | None = None
+        self._path_vel: np.ndarray | None = None
+        self._i = 0
+
+        self._target: tuple | None = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self.ticks = 0
+        self.overruns = 0
+
+    @property
+    def position(self) -> tuple:
+        return tuple(int(round(p)) for p in self._pos)
+
+    def set_target(self, pose: Sequence[float]):
+        with self._lock:
+            self._target = tuple(pose)
+        self._wake.set()
+
+    def jump(self, pose: Sequence[float]):
+        # Take over a pose the caller sends itself (pre-shaped animation
+        # frames): drop the current move without emitting, so the next
+        # set_target() plans from here.
+        with self._lock:
+            self._target = None
+            self._path = self._path_vel = None
+            self._pos = np.asarray(pose, dtype=float)
+            self._vel = np.zeros_like(self._pos)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="trajectory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def _replan(self, target: tuple):
+        self._path, self._path_vel = plan(
+            self._pos, target, self.vmax, self.amax, self.rate_hz, v0=self._vel
+        )
+        self._i = 0
+
+    def _run(self):
+        period = 1 / self.rate_hz
+        deadline = time.perf_counter()
+        while self._running:
+            if self._path is None:
+                # Idle: sleep until a target arrives instead of ticking.
+                self._wake.wait()
+                self._wake.clear()
+                deadline = time.perf_counter()
+
+            # Held through emit() so a jump() never races a stale tick.
+            with self._lock:
+                target, self._target = self._target, None
+                if target is not None:
+                    self._replan(target)
+                if self._path is None:
+                    continue
+
+                self._pos = self._path[self._i]
+                self._vel = self._path_vel[self._i]
+                self._i += 1
+                if self._i >= len(self._path):
+                    self._path = self._path_vel = None
+                self._emit(self.position, self._path is None)
+                self.ticks += 1
+
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.overruns += 1
+                deadline = time.perf_counter()
+
+
+# BENCHMARK
+def main():
+    ap = argparse.ArgumentParser("Plan a multi-joint move and time the vectorized evaluation")
+    ap.add_argument("--joints", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=1000)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = rng.uniform(10, 170, args.joints)
+    target = rng.uniform(10, 170, args.joints)
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        pos, vel = plan(start, target)
+    dt = (time.perf_counter() - t0) / args.repeat
+
+    print(f"[Trajectory] {args.joints} joints, {len(pos)} ticks @ {CONTROL_HZ} Hz")
+    print(f"  plan_time_us     {1e6 * dt:.1f}")
+    print(f"  peak_vel         {np.abs(vel).max():.1f} deg/s (limit {MAX_VEL})")
+    print(f"  peak_acc         {np.abs(np.diff(vel, axis=0)).max() * CONTROL_HZ:.1f} deg/s^2 (limit {MAX_ACC})")
+    print(f"  end_error        {np.abs(pos[-1] - target).max():.3f} deg")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
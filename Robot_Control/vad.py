@@ -0,0 +1,183 @@
+from __future__ import annotations
+import argparse, json, sys, time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16_000
+
+
+class EnergyVad:
+    # Energy + zero-crossing gate in front of the recognizer. Each block is
+    # split into short frames and scored in one NumPy pass; a block counts
+    # as speech when enough frames sit above the adaptive noise floor with
+    # a voiced-looking crossing rate. Recent silent blocks are kept as
+    # pre-roll so word onsets reach the recognizer, and a hangover keeps
+    # forwarding after speech so Kaldi sees the trailing silence it needs
+    # to close the utterance.
+
+    def __init__(
+        self,
+        rate: int = SAMPLE_RATE,
+        frame_ms: float = 20.0,
+        margin_db: float = 9.0,
+        min_db: float = -55.0,
+        zcr_max: float = 0.35,
+        min_frames: int = 2,
+        pre_roll: float = 0.3,
+        hangover: float = 0.6,
+        noise_alpha: float = 0.05,
+    ):
+        self.rate = rate
+        self.frame_len = int(rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.zcr_max = zcr_max
+        self.min_frames = min_frames
+        self.pre_roll = pre_roll
+        self.hangover = hangover
+        self.noise_alpha = noise_alpha
+        self.reset()
+
+    def reset(self):
+        self.noise_db: float | None = None
+        self._pending: deque[bytes] = deque()
+        self._pending_len = 0
+        self._quiet = self.hangover   # seconds since the last speech block
+        self.blocks = 0
+        self.forwarded = 0
+        self.samples = 0
+        self.samples_forwarded = 0
+
+    def score(self, block: bytes) -> tuple[np.ndarray, np.ndarray]:
+        # Per-frame level (dBFS) and zero-crossing rate for one int16 block.
+        x = np.frombuffer(block, dtype=np.int16)
+        n = len(x) // self.frame_len
+        if n == 0:
+            x, n = np.pad(x, (0, self.frame_len - len(x))), 1
+        frames = x[:n * self.frame_len].reshape(n, self.frame_len).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        level = 20 * np.log10(rms / 32768.0 + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        return level, zcr
+
+    def is_speech(self, block: bytes) -> bool:
+        level, zcr = self.score(block)
+        floor = float(np.percentile(level, 20))
+        if self.noise_db is None:
+            self.noise_db = floor
+        threshold = max(self.noise_db + self.margin_db, self.min_db)
+        voiced = (level > threshold) & ((zcr < self.zcr_max) | (level > threshold + 10))
+        speech = int(voiced.sum()) >= min(self.min_frames, len(level))
+        if not speech:
+            self.noise_db += self.noise_alpha * (floor - self.noise_db)
+        elif floor < self.noise_db:
+            self.noise_db = floor
+        return speech
+
+    def process(self, block: bytes) -> list[bytes]:
+        # Blocks to hand to the recognizer, oldest first. They are always
+        # contiguous and end with `block`.
+        n = len(block) // 2
+        self.blocks += 1
+        self.samples += n
+        if self.is_speech(block):
+            self._quiet = 0.0
+        else:
+            self._quiet += n / self.rate
+
+        if self._quiet < self.hangover:
+            out = list(self._pending) + [block]
+            self._pending.clear()
+            self._pending_len = 0
+        else:
+            self._pending.append(block)
+            self._pending_len += n
+            while self._pending_len - len(self._pending[0]) // 2 >= self.pre_roll * self.rate:
+                self._pending_len -= len(self._pending.popleft()) // 2
+            return []
+
+        self.forwarded += len(out)
+        self.samples_forwarded += sum(len(b) for b in out) // 2
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "blocks": self.blocks,
+            "forwarded": self.forwarded,
+            "forwarded_ratio": self.samples_forwarded / self.samples if self.samples else 0.0,
+            "noise_db": self.noise_db,
+        }
+
+
+# OFFLINE COMPARISON
+def _words_distance(a: list[str], b: list[str]) -> int:
+    d = np.arange(len(b) + 1)
+    for i, wa in enumerate(a, 1):
+        prev, d[0] = d.copy(), i
+        for j, wb in enumerate(b, 1):
+            d[j] = min(prev[j] + 1, d[j - 1] + 1, prev[j - 1] + (wa != wb))
+    return int(d[-1])
+
+
+def decode(pcm: bytes, model_dir: Path, vad: EnergyVad | None, block_len: int = 1_600) -> tuple[str, float]:
+    from model_cache import new_recognizer
+
+    rec = new_recognizer(model_dir)
+    texts = []
+    t0 = time.process_time()
+    for i in range(0, len(pcm), 2 * block_len):
+        block = pcm[i:i + 2 * block_len]
+        for b in (vad.process(block) if vad else (block,)):
+            if rec.AcceptWaveform(b):
+                texts.append(json.loads(rec.Result()).get("text", ""))
+    texts.append(json.loads(rec.FinalResult()).get("text", ""))
+    return " ".join(t for t in texts if t), time.process_time() - t0
+
+
+def main():
+    from model_cache import DEFAULT_MODEL, get_model
+    from voice_command import collect_files, read_pcm
+
+    ap = argparse.ArgumentParser("Compare recognizer CPU time and accuracy with and without the VAD gate")
+    ap.add_argument("paths", nargs="+", type=Path, help="WAV/raw PCM files or directories; "
+                    "a .txt next to a file is used as its reference transcript")
+    ap.add_argument("--model", type=Path, default=DEFAULT_MODEL)
+    args = ap.parse_args()
+
+    get_model(args.model)
+    cpu = {"off": 0.0, "on": 0.0}
+    errors = {"off": 0, "on": 0}
+    ref_words = audio_s = 0
+    forwarded = 0.0
+    files = collect_files(args.paths)
+    for path in files:
+        pcm = read_pcm(path)
+        audio_s += len(pcm) / (2 * SAMPLE_RATE)
+        vad = EnergyVad()
+        text_off, cpu_off = decode(pcm, args.model, None)
+        text_on, cpu_on = decode(pcm, args.model, vad)
+        cpu["off"] += cpu_off
+        cpu["on"] += cpu_on
+        forwarded += vad.stats()["forwarded_ratio"]
+
+        ref_file = path.with_suffix(".txt")
+        ref = (ref_file.read_text() if ref_file.exists() else text_off).lower().split()
+        ref_words += len(ref)
+        errors["off"] += _words_distance(ref, text_off.split())
+        errors["on"] += _words_distance(ref, text_on.split())
+        print(f"  {path.name:24} fwd {100 * vad.stats()['forwarded_ratio']:5.1f}%  "
+              f"cpu {cpu_off:6.2f}s -> {cpu_on:6.2f}s  {text_on!r}")
+
+    n = len(files)
+    print(f"[VAD] {n} files, {audio_s:.1f}s audio, {100 * forwarded / n:.1f}% forwarded")
+    print(f"  cpu_s            off {cpu['off']:.2f}  on {cpu['on']:.2f}"
+          f"  (saved {100 * (1 - cpu['on'] / cpu['off']) if cpu['off'] else 0:.0f}%)")
+    if ref_words:
+        print(f"  wer              off {100 * errors['off'] / ref_words:.1f}%"
+              f"  on {100 * errors['on'] / ref_words:.1f}%")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,114 +1,261 @@
 from __future__ import annotations
 import argparse
 import json
+import os
 import queue
 import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import sounddevice as sd
-from vosk import KaldiRecognizer, Model
+from model_cache import DEFAULT_MODEL, get_model, new_recognizer
+from vad import EnergyVad
 
 SAMPLE_RATE = 16_000
 BLOCK_LEN   = 8_000
 FORMAT      = "int16"
 
-HERE = Path(__file__).resolve().parent
-DEFAULT_MODEL = HERE / "models" / "vosk-model-small-en-us-0.15"
-
-parser = argparse.ArgumentParser(description="Live speech-to-text with Vosk")
-parser.add_argument(
-    "model_dir",
-    nargs="?",
-    type=Path,
-    default=DEFAULT_MODEL,
-    help="Path to an unpacked Vosk model directory (defaults to ./models/vosk-model-small-en-us-0.15)",
-)
-parser.add_argument(
-    "--device",
-    help="Input device name or index for microphone (use --list-devices to see options)",
-)
-parser.add_argument(
-    "--list-devices",
-    action="store_true",
-    help="List audio devices and exit",
-)
-args = parser.parse_args()
-
-if args.list_devices:
-    print(sd.query_devices())
-    sys.exit(0)
-
-model_dir = Path(args.model_dir).resolve()
-print(f"[Vosk] using model: {model_dir}")
-if not model_dir.is_dir():
-    sys.exit(f"Model directory '{model_dir}' not found.")
-
-if args.device is not None:
-    try:
-        dev = int(args.device) if args.device.isdigit() else args.device
-        sd.default.device = (None, dev)
-    except Exception as e:
-        sys.exit(f"Invalid --device '{args.device}': {e}")
+AUDIO_SUFFIXES = {".wav", ".raw", ".pcm"}
+
+
+# LIVE
+def listen(model_dir: Path, device: str | None, vad: EnergyVad | None):
+    import sounddevice as sd
 
-print("[Audio] default devices:", sd.default.device)
+    if device is not None:
+        try:
+            dev = int(device) if device.isdigit() else device
+            sd.default.device = (None, dev)
+        except Exception as e:
+            sys.exit(f"Invalid --device '{device}': {e}")
 
-print("Loading Vosk model…", file=sys.stderr)
-model = Model(str(model_dir))
-rec = KaldiRecognizer(model, SAMPLE_RATE)
-rec.SetWords(True)
+    print("[Audio] default devices:", sd.default.device)
 
-audio_q: queue.Queue[bytes] = queue.Queue(maxsize=20)
+    rec = new_recognizer(model_dir, rate=SAMPLE_RATE)
+
+    audio_q: queue.Queue[bytes] = queue.Queue(maxsize=20)
+
+    def audio_cb(indata, frames, t, status):
+        if status:
+            print("[Audio][STATUS]", status, file=sys.stderr)
+        try:
+            audio_q.put_nowait(bytes(indata))
+        except queue.Full:
+            pass
+
+    def open_stream():
+        """Open the mic stream; try given BLOCK_LEN, fall back to None if needed."""
+        try:
+            return sd.RawInputStream(
+                samplerate=SAMPLE_RATE,
+                blocksize=BLOCK_LEN,
+                dtype=FORMAT,
+                channels=1,
+                callback=audio_cb,
+            )
+        except Exception as e:
+            print(f"[Audio] Could not open stream with blocksize={BLOCK_LEN}: {e}", file=sys.stderr)
+            print("[Audio] Retrying with blocksize=None…", file=sys.stderr)
+            return sd.RawInputStream(
+                samplerate=SAMPLE_RATE,
+                blocksize=None,
+                dtype=FORMAT,
+                channels=1,
+                callback=audio_cb,
+            )
 
-def audio_cb(indata, frames, t, status):
-    if status:
-        print("[Audio][STATUS]", status, file=sys.stderr)
     try:
-        audio_q.put_nowait(bytes(indata))
-    except queue.Full:
-        pass
+        with open_stream() as stream:
+            print("[Listening – press Ctrl-C to stop]")
+            print("[Audio] stream opened:", stream)
+            while True:
+                try:
+                    block = audio_q.get(timeout=2.0)
+                except queue.Empty:
+                    print("[Audio] no audio blocks received (2s)… still waiting.")
+                    continue
+
+                for b in (vad.process(block) if vad else (block,)):
+                    if rec.AcceptWaveform(b):
+                        result = json.loads(rec.Result())
+                        text = result.get("text", "")
+                        if text:
+                            print(f"\n>> {text}\n")
+                    else:
+                        partial = json.loads(rec.PartialResult()).get("partial", "")
+                        if partial:
+                            print(f"\r{partial}        ", end="", flush=True)
+    except KeyboardInterrupt:
+        print("\n[stopped]")
+    except Exception as exc:
+        sys.exit(f"Error: {exc}")
+
+
+# BATCH
+def collect_files(paths: list[Path]) -> list[Path]:
+    out = []
+    for p in paths:
+        if p.is_dir():
+            out.extend(sorted(f for f in p.rglob("*") if f.suffix.lower() in AUDIO_SUFFIXES))
+        else:
+            out.append(p)
+    return out
+
+
+def read_pcm(path: Path) -> bytes:
+    # .wav must be mono 16-bit at SAMPLE_RATE; anything else is taken as
+    # headerless int16 mono PCM at SAMPLE_RATE.
+    if path.suffix.lower() != ".wav":
+        return path.read_bytes()
+    with wave.open(str(path), "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"need mono 16-bit {SAMPLE_RATE} Hz PCM")
+        return wf.readframes(wf.getnframes())
+
+
+_worker_model: Path | None = None
+_worker_grammar: str | None = None
+_worker_vad = True
+
+
+def _init_worker(model_dir: Path, grammar: str | None, use_vad: bool):
+    # Each worker process loads its own model once and reuses it per file.
+    global _worker_model, _worker_grammar, _worker_vad
+    _worker_model, _worker_grammar, _worker_vad = model_dir, grammar, use_vad
+    get_model(model_dir)
 
-def open_stream():
-    """Open the mic stream; try given BLOCK_LEN, fall back to None if needed."""
+
+def transcribe_file(path: Path) -> dict:
+    from voice_movement import extract_commands
+
+    row = {"file": str(path)}
     try:
-        return sd.RawInputStream(
-            samplerate=SAMPLE_RATE,
-            blocksize=BLOCK_LEN,
-            dtype=FORMAT,
-            channels=1,
-            callback=audio_cb,
-        )
+        pcm = read_pcm(path)
     except Exception as e:
-        print(f"[Audio] Could not open stream with blocksize={BLOCK_LEN}: {e}", file=sys.stderr)
-        print("[Audio] Retrying with blocksize=None…", file=sys.stderr)
-        return sd.RawInputStream(
-            samplerate=SAMPLE_RATE,
-            blocksize=None,
-            dtype=FORMAT,
-            channels=1,
-            callback=audio_cb,
-        )
-
-try:
-    with open_stream() as stream:
-        print("[Listening – press Ctrl-C to stop]")
-        print("[Audio] stream opened:", stream)
-        while True:
-            try:
-                block = audio_q.get(timeout=2.0)
-            except queue.Empty:
-                print("[Audio] no audio blocks received (2s)… still waiting.")
-                continue
-
-            if rec.AcceptWaveform(block):
-                result = json.loads(rec.Result())
-                text = result.get("text", "")
-                if text:
-                    print(f"\n>> {text}\n")
-            else:
-                partial = json.loads(rec.PartialResult()).get("partial", "")
-                if partial:
-                    print(f"\r{partial}        ", end="", flush=True)
-except KeyboardInterrupt:
-    print("\n[stopped]")
-except Exception as exc:
-    sys.exit(f"Error: {exc}")
\ No newline at end of file
+        row["error"] = str(e)
+        return row
+
+    rec = new_recognizer(_worker_model, _worker_grammar, SAMPLE_RATE)
+    vad = EnergyVad() if _worker_vad else None
+    step = 2 * BLOCK_LEN
+    texts = []
+    t0 = time.perf_counter()
+    for i in range(0, len(pcm), step):
+        block = pcm[i:i + step]
+        for b in (vad.process(block) if vad else (block,)):
+            if rec.AcceptWaveform(b):
+                texts.append(json.loads(rec.Result()).get("text", ""))
+    t_end = time.perf_counter()
+    texts.append(json.loads(rec.FinalResult()).get("text", ""))
+    t_done = time.perf_counter()
+
+    audio_s = len(pcm) / (2 * SAMPLE_RATE)
+    text = " ".join(t for t in texts if t)
+    row.update(
+        text=text,
+        commands=extract_commands(text.split()),
+        audio_s=round(audio_s, 3),
+        decode_s=round(t_done - t0, 3),
+        rtf=round((t_done - t0) / audio_s, 4) if audio_s else None,
+        final_latency_ms=round(1000 * (t_done - t_end), 1),
+    )
+    if vad:
+        row["vad_forwarded"] = round(vad.stats()["forwarded_ratio"], 3)
+    return row
+
+
+def run_batch(paths: list[Path], model_dir: Path, grammar: str | None, use_vad: bool, workers: int, out) -> int:
+    files = collect_files(paths)
+    if not files:
+        sys.exit("No audio files found")
+    print(f"[Batch] {len(files)} files on {workers} workers", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    audio_s = errors = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_dir, grammar, use_vad)) as pool:
+        for row in pool.map(transcribe_file, files):
+            out.write(json.dumps(row) + "\n")
+            out.flush()
+            audio_s += row.get("audio_s", 0)
+            errors += "error" in row
+    wall = time.perf_counter() - t0
+    print(f"[Batch] {audio_s:.1f}s audio in {wall:.1f}s wall "
+          f"({audio_s / wall:.1f}x real time), {errors} errors", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live speech-to-text with Vosk")
+    parser.add_argument(
+        "model_dir",
+        nargs="?",
+        type=Path,
+        default=DEFAULT_MODEL,
+        help="Path to an unpacked Vosk model directory (defaults to ./models/vosk-model-small-en-us-0.15)",
+    )
+    parser.add_argument(
+        "--device",
+        help="Input device name or index for microphone (use --list-devices to see options)",
+    )
+    parser.add_argument(
+        "--list-devices",
+        action="store_true",
+        help="List audio devices and exit",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        type=Path,
+        metavar="PATH",
+        help="Transcribe WAV/raw PCM files or directories offline and print JSONL (no serial output)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for --batch (default: CPU count)",
+    )
+    parser.add_argument(
+        "--commands-only",
+        action="store_true",
+        help="Restrict the recognizer grammar to the robot command words",
+    )
+    parser.add_argument(
+        "--no-vad",
+        action="store_true",
+        help="Feed silence to the recognizer too (disables the voice activity gate)",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        help="Write --batch JSONL here instead of stdout",
+    )
+    args = parser.parse_args()
+
+    if args.list_devices:
+        import sounddevice as sd
+        print(sd.query_devices())
+        return 0
+
+    model_dir = Path(args.model_dir).resolve()
+    print(f"[Vosk] using model: {model_dir}", file=sys.stderr if args.batch else sys.stdout)
+    if not model_dir.is_dir():
+        sys.exit(f"Model directory '{model_dir}' not found.")
+
+    if args.batch:
+        grammar = None
+        if args.commands_only:
+            from voice_engine import command_grammar
+            grammar = command_grammar()
+        if args.out:
+            with args.out.open("w") as out:
+                return run_batch(args.batch, model_dir, grammar, not args.no_vad, args.workers, out)
+        return run_batch(args.batch, model_dir, grammar, not args.no_vad, args.workers, sys.stdout)
+
+    listen(model_dir, args.device, None if args.no_vad else EnergyVad())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+from __future__ import annotations
+import argparse, bisect, json, sys, threading, time, wave
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable
+
+from vosk import KaldiRecognizer
+
+import model_cache
+from model_cache import DEFAULT_MODEL, SAMPLE_RATE
+from vad import EnergyVad
+from voice_movement import COMMAND_WORDS
+
+BLOCK_LEN    = 1_600    # 100 ms
+QUEUE_BLOCKS = 10       # ~1 s of audio before the oldest block is dropped
+STABLE_PARTIALS = 2     # a partial word must repeat this often before dispatch
+IMMEDIATE_WORDS = {"stop"}
+
+
+def command_grammar() -> str:
+    return json.dumps(sorted(COMMAND_WORDS) + ["[unk]"])
+
+
+def new_recognizer(model_dir=DEFAULT_MODEL, rate: int = SAMPLE_RATE) -> KaldiRecognizer:
+    return model_cache.new_recognizer(model_dir, command_grammar(), rate)
+
+
+class AudioQueue:
+    # Bounded queue fed from the audio callback; when the consumer falls
+    # behind the oldest block is dropped so we always act on fresh speech.
+
+    def __init__(self, maxlen: int = QUEUE_BLOCKS):
+        self._q: deque[bytes] = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, block: bytes):
+        with self._cond:
+            if len(self._q) == self._q.maxlen:
+                self.dropped += 1
+            self._q.append(block)
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None) -> bytes | None:
+        with self._cond:
+            if not self._q:
+                self._cond.wait(timeout)
+            return self._q.popleft() if self._q else None
+
+
+class PartialDispatcher:
+    # Tracks the words of the current utterance and releases each one once,
+    # as soon as it has been stable across partial results. The final
+    # result flushes whatever was not dispatched yet. The recognizer may
+    # rewrite earlier words at any point, so what was sent is kept as a
+    # count per command rather than as a position in the transcript.
+
+    def __init__(self, stable: int = STABLE_PARTIALS):
+        self.stable = stable
+        self._seen: list[tuple[str, int]] = []
+        self._sent: Counter[str] = Counter()
+
+    def _words(self, text: str) -> list[str]:
+        return [w for w in text.split() if w in COMMAND_WORDS]
+
+    def partial(self, text: str) -> list[str]:
+        words = self._words(text)
+        seen = []
+        for i, w in enumerate(words):
+            count = self._seen[i][1] + 1 if i < len(self._seen) and self._seen[i][0] == w else 1
+            seen.append((w, count))
+        self._seen = seen
+
+        ready = []
+        for w, count in seen:
+            if count < self.stable and w not in IMMEDIATE_WORDS:
+                break
+            ready.append(w)
+        return self._release(ready)
+
+    def final(self, text: str) -> list[str]:
+        out = self._release(self._words(text))
+        self._seen, self._sent = [], Counter()
+        return out
+
+    def _release(self, words: list[str]) -> list[str]:
+        # The n-th occurrence of a command goes out only if fewer than n
+        # were already dispatched in this utterance.
+        out, seen = [], Counter()
+        for w in words:
+            seen[w] += 1
+            if seen[w] > self._sent[w]:
+                self._sent[w] += 1
+                out.append(w)
+        return out
+
+
+class VoiceEngine:
+    def __init__(
+        self,
+        rec: KaldiRecognizer,
+        on_words: Callable[[list[str]], None],
+        rate: int = SAMPLE_RATE,
+        block_len: int = BLOCK_LEN,
+        vad: EnergyVad | None = None,
+    ):
+        self.rec = rec
+        self.on_words = on_words
+        self.vad = vad
+        self.rate = rate
+        self.block_len = block_len
+        self.queue = AudioQueue()
+        self.dispatcher = PartialDispatcher()
+        self.samples = 0     # audio heard
+        self.fed = 0         # audio passed to the recognizer
+        self._fed_map: list[tuple[int, int]] = []   # (fed, heard - fed) after each gap
+        self.busy = 0.0
+        self.finals: list[dict] = []
+        self.dispatched: list[tuple[str, float]] = []   # (word, audio time)
+
+    def _dispatch(self, words: list[str]):
+        if not words:
+            return
+        at = self.samples / self.rate
+        self.dispatched.extend((w, at) for w in words)
+        print(f">> {' '.join(words)}")
+        self.on_words(words)
+
+    def accept(self, block: bytes):
+        t0 = time.perf_counter()
+        self.samples += len(block) // 2
+        blocks = self.vad.process(block) if self.vad else (block,)
+        if blocks:
+            offset = self.samples - sum(len(b) for b in blocks) // 2 - self.fed
+            if not self._fed_map or offset != self._fed_map[-1][1]:
+                self._fed_map.append((self.fed, offset))
+        for b in blocks:
+            self.fed += len(b) // 2
+            self._recognize(b)
+        self.busy += time.perf_counter() - t0
+
+    def _recognize(self, block: bytes):
+        if self.rec.AcceptWaveform(block):
+            result = json.loads(self.rec.Result())
+            self.finals.append(result)
+            self._dispatch(self.dispatcher.final(result.get("text", "")))
+        else:
+            partial = json.loads(self.rec.PartialResult()).get("partial", "")
+            self._dispatch(self.dispatcher.partial(partial))
+
+    def heard_time(self, fed_s: float) -> float:
+        # Map a recognizer timestamp back onto the audio that was heard,
+        # accounting for the silence the VAD held back.
+        fed = int(fed_s * self.rate)
+        i = bisect.bisect_right(self._fed_map, (fed, float("inf"))) - 1
+        offset = self._fed_map[i][1] if i >= 0 else 0
+        return (fed + offset) / self.rate
+
+    def audio_cb(self, indata, frames, t, status):
+        if status:
+            print("[Voice]", status, file=sys.stderr)
+        self.queue.put(bytes(indata))
+
+    def run_live(self, running: threading.Event):
+        import sounddevice as sd
+
+        with sd.RawInputStream(
+            samplerate=self.rate,
+            blocksize=self.block_len,
+            dtype="int16",
+            channels=1,
+            callback=self.audio_cb,
+        ):
+            while running.is_set():
+                block = self.queue.get(timeout=0.2)
+                if block is not None:
+                    self.accept(block)
+
+    def run_wav(self, path: Path):
+        with wave.open(str(path), "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != self.rate:
+                raise ValueError(f"{path}: need mono 16-bit {self.rate} Hz PCM")
+            while True:
+                block = wf.readframes(self.block_len)
+                if not block:
+                    break
+                self.accept(block)
+        result = json.loads(self.rec.FinalResult())
+        self.finals.append(result)
+        self._dispatch(self.dispatcher.final(result.get("text", "")))
+
+    def word_latencies(self) -> list[tuple[str, float]]:
+        # Audio time at dispatch minus the recognizer's end time for the
+        # same word; dispatch order follows utterance order.
+        ends = [
+            (w["word"], self.heard_time(w["end"]))
+            for r in self.finals
+            for w in r.get("result", [])
+            if w["word"] in COMMAND_WORDS
+        ]
+        out = []
+        for (word, at), (ref, end) in zip(self.dispatched, ends):
+            if word == ref:
+                out.append((word, at - end))
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser("Feed WAV files through the streaming voice engine (no serial output)")
+    ap.add_argument("wavs", nargs="+", type=Path)
+    ap.add_argument("--model", type=Path, default=DEFAULT_MODEL)
+    ap.add_argument("--no-vad", action="store_true", help="feed every block to the recognizer")
+    args = ap.parse_args()
+
+    for path in args.wavs:
+        vad = None if args.no_vad else EnergyVad()
+        engine = VoiceEngine(new_recognizer(args.model), on_words=lambda words: None, vad=vad)
+        engine.run_wav(path)
+        audio_s = engine.samples / engine.rate
+        lat = engine.word_latencies()
+        fed = f", {100 * engine.fed / engine.samples:.0f}% past VAD" if engine.vad else ""
+        print(f"[Voice] {path.name}: {audio_s:.1f}s audio, RTF {engine.busy / audio_s:.3f}{fed}")
+        for word, delay in lat:
+            print(f"  {word:10} dispatched {1000 * delay:+.0f} ms after word end")
+        if lat:
+            print(f"  mean             {1000 * sum(d for _, d in lat) / len(lat):+.0f} ms"
+                  f" (+{1000 * engine.busy / max(1, engine.samples // engine.block_len):.1f} ms compute per block)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
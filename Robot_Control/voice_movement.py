@@ -1,9 +1,12 @@
 from __future__ import annotations
-import argparse, json, queue, struct, sys, threading, time
+import argparse, sys, threading, time
 from pathlib import Path
-import serial, serial.tools.list_ports as list_ports
-import sounddevice as sd
-from vosk import KaldiRecognizer, Model
+from serial_link import get_link
+from scheduler import SKIP, Task, get_scheduler
+from animation import Playback, load_animation, play
+from arbiter import animation_pose, get_arbiter, get_stream
+from robot_state import get_state
+from recorder import record
 
 COMMAND_WORDS = {
     "left", "right", "up", "down", "stop",
@@ -15,101 +18,66 @@ SERVO_MIN, SERVO_MAX = 10, 170
 STEP_DEG   = 2
 TICK_HZ    = 8
 
-WAVE_DURATION = 2.0
-WAVE_HZ       = 3
-WAVE_AMPL     = 20
+WAVE_ANIMATION = "wave"   # Robot_Animations/wave.json
 
-servo_pan   = 90
-servo_tilt  = 90
-servo_level = 90
-
-claw_grab_angles    = (170, 10)
-claw_release_angles = (10, 170)
-claw_grabbing = False
+# pan/tilt/level are servo1/2/3 of the shared pose
+state = get_state()
 
 _dir_x = _dir_y = 0
 
-_move_evt = threading.Event()
-_mover_thr: threading.Thread | None = None
-_wave_thr:  threading.Thread | None = None
-
-def _find_arduino() -> str | None:
-    for p in list_ports.comports():
-        if "Arduino" in p.description or "usbmodem" in p.device:
-            return p.device
-    return None
-
-def _open_serial() -> serial.Serial | None:
-    port = _find_arduino()
-    if port:
-        try:
-            return serial.Serial(port, 9600)
-        except Exception as e:
-            print("[Serial]", e, file=sys.stderr)
-    else:
-        print("[Serial] Arduino not found", file=sys.stderr)
-    return None
-
-ser = _open_serial()
-
+# Voice callbacks and scheduler ticks both touch the jog direction and tasks
+_cmd_lock = threading.RLock()
+_jog_task:  Task | None = None
+_wave:      Playback | None = None
 
 def _clamp(v: int) -> int:
     return max(SERVO_MIN, min(SERVO_MAX, v))
 
-def _send_angles():
-    global ser, servo_pan, servo_tilt, servo_level, claw_grabbing
-    pkt = struct.pack(
-        "HHHHH",
-        _clamp(servo_pan),
-        _clamp(servo_tilt),
-        _clamp(servo_level),
-        *(claw_grab_angles if claw_grabbing else claw_release_angles),
+def _jog_tick(now: float):
+    with _cmd_lock:
+        dx, dy = _dir_x, _dir_y
+    if not (dx or dy):
+        return False
+    pose = state.pose
+    get_arbiter().submit(
+        "voice",
+        servo1=_clamp(pose.servo1 + STEP_DEG * dx),
+        servo2=_clamp(pose.servo2 + STEP_DEG * dy),
     )
-    if ser:
-        try:
-            ser.write(pkt)
-        except serial.SerialException:
-            ser = _open_serial()
-
-def _mover_loop():
-    global servo_pan, servo_tilt, _dir_x, _dir_y
-    tick = 1 / TICK_HZ
-    while _move_evt.is_set():
-        if not (_dir_x or _dir_y):
-            _move_evt.clear(); break
-        servo_pan  += STEP_DEG * _dir_x
-        servo_tilt += STEP_DEG * _dir_y
-        _send_angles()
-        time.sleep(tick)
 
-def _pan_wave_loop(origin: int):
-    global servo_pan, claw_grabbing
+def _current_pose() -> tuple:
+    return animation_pose(state.pose)
 
-    half_period = 1 / (2 * WAVE_HZ)
-    end_time    = time.time() + WAVE_DURATION
-    direction   = 1
+def _emit_wave(pose: tuple):
+    get_arbiter().submit_frame("animation", pose)
 
-    while time.time() < end_time:
-        servo_pan = _clamp(origin + direction * WAVE_AMPL)
-        claw_grabbing = direction < 0
+def _wave_done(cancelled: bool):
+    get_arbiter().release("animation")
 
-        _send_angles()
+def _play_wave() -> Playback:
+    return play(load_animation(WAVE_ANIMATION), _emit_wave, _current_pose, _wave_done)
 
-        direction *= -1
-        time.sleep(half_period)
 
-    servo_pan      = origin
-    claw_grabbing  = False
-    _send_angles()
+def extract_commands(words: list[str]) -> list[str]:
+    # The word filter handle_command applies, without touching the arm.
+    return [w.lower() for w in words if w.lower() in COMMAND_WORDS]
 
 
 def handle_command(words: list[str]):
-    global _dir_x, _dir_y, claw_grabbing, servo_pan, servo_tilt, servo_level, ser, _mover_thr, _wave_thr
-
-    cmds = [w.lower() for w in words if w.lower() in COMMAND_WORDS]
+    for w in words:
+        record("voice", text=w)
+    cmds = extract_commands(words)
     if not cmds:
         return
+    with _cmd_lock:
+        _apply_commands(cmds)
+
+
+def _apply_commands(cmds: list[str]):
+    global _dir_x, _dir_y, _jog_task, _wave
 
+    changes = {}
+    wave = False
     for w in cmds:
         if w == "left":
             _dir_x = -1
@@ -121,50 +89,49 @@ def handle_command(words: list[str]):
             _dir_y = 1
         elif w == "stop":
             _dir_x = _dir_y = 0
+            if _jog_task:
+                _jog_task.cancel()
+            if _wave:
+                _wave.cancel()
+            wave = False
+            changes.clear()
+            # Overrides every input mode, not just voice
+            get_stream().stop_motion()
         elif w in {"open", "release"}:
-            claw_grabbing = False
+            changes["claw_grabbing"] = False
         elif w in {"close", "grab"}:
-            claw_grabbing = True
+            changes["claw_grabbing"] = True
         elif w == "reset":
-            if ser:
-                try:
-                    ser.setDTR(False); time.sleep(0.1); ser.setDTR(True)
-                except serial.SerialException:
-                    ser = _open_serial()
-            servo_pan = servo_tilt = servo_level = 90
+            get_link().reset_board()
+            changes.update(servo1=90, servo2=90, servo3=90)
             _dir_x = _dir_y = 0
+            if _jog_task:
+                _jog_task.cancel()
+            if _wave:
+                _wave.cancel()
+            wave = False
         elif w == "hello":
-            servo_tilt  = SERVO_MIN
-            servo_level = SERVO_MAX
-            claw_grabbing = False
+            changes.update(servo3=SERVO_MAX, claw_grabbing=False)   # servo2 follows the claw
             _dir_x = _dir_y = 0
-            if not _wave_thr or not _wave_thr.is_alive():
-                origin = servo_pan
-                _wave_thr = threading.Thread(target=_pan_wave_loop, args=(origin,), daemon=True)
-                _wave_thr.start()
+            wave = True
 
-    _send_angles()
+    if changes:
+        get_arbiter().submit("voice", **changes)
 
-    if (_dir_x or _dir_y) and not _move_evt.is_set():
-        _move_evt.set(); _mover_thr = threading.Thread(target=_mover_loop, daemon=True); _mover_thr.start()
+    if wave and (_wave is None or not _wave.active):
+        _wave = _play_wave()
+
+    if (_dir_x or _dir_y) and (_jog_task is None or not _jog_task.active):
+        _jog_task = get_scheduler().every(1 / TICK_HZ, _jog_tick, SKIP, "jog")
 
-VOICE_RATE, VOICE_BLOCK = 16_000, 8_000
 _voice_evt = threading.Event()
 
 def _voice_loop(model_dir: Path):
-    mdl = Model(str(model_dir)); rec = KaldiRecognizer(mdl, VOICE_RATE); q: queue.Queue[bytes] = queue.Queue()
-    def cb(indata, frames, t, status):
-        if status: print(status, file=sys.stderr); q.put(bytes(indata))
+    from vad import EnergyVad
+    from voice_engine import VoiceEngine, new_recognizer
+    engine = VoiceEngine(new_recognizer(model_dir), handle_command, vad=EnergyVad())
     print(f"[Voice] say {' / '.join(sorted(COMMAND_WORDS))}")
-    with sd.RawInputStream(samplerate=VOICE_RATE, blocksize=VOICE_BLOCK, dtype="int16", channels=1, callback=cb):
-        while _voice_evt.is_set():
-            data = q.get()
-            if rec.AcceptWaveform(data):
-                txt = json.loads(rec.Result()).get("text", "")
-                words = [w for w in txt.split() if w in COMMAND_WORDS]
-                if words:
-                    print(">>", " ".join(words))
-                    handle_command(words)
+    engine.run_live(_voice_evt)
 
 def main():
     ap = argparse.ArgumentParser("Continuous voice jog controller")
@@ -173,6 +140,8 @@ def main():
     if not args.model.is_dir():
         sys.exit("Model directory not found")
 
+    get_link().add_listener(lambda up: print(f"[Serial] {'connected' if up else 'disconnected'}", file=sys.stderr))
+
     _voice_evt.set()
     t = threading.Thread(target=_voice_loop, args=(args.model,), daemon=True)
     t.start()
@@ -184,6 +153,9 @@ def main():
         print("\n[stopped]")
         _voice_evt.clear()
         t.join()
+    for name, st in get_scheduler().stats().items():
+        print(f"[Scheduler] {name}: {st['runs']} ticks, {st['missed']} missed, "
+              f"jitter p99 {st['jitter_p99_ms']:.2f} ms", file=sys.stderr)
 
 if __name__ == "__main__":
     main()